@@ -1,37 +1,38 @@
 import os
+import hmac
+import json
+import math
+import time
+import atexit
 import logging
+import threading
 os.environ["CUDA_VISIBLE_DEVICES"] = "-1"
 os.environ["TF_FORCE_GPU_ALLOW_GROWTH"] = "true"
 os.environ['TF_METAL_DISABLE'] = '1'
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('app.log'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
-logging.getLogger('werkzeug').setLevel(logging.WARNING)
-logging.getLogger('tensorflow').setLevel(logging.WARNING)
-logging.getLogger('pymongo').setLevel(logging.WARNING)
-logging.getLogger('h5py').setLevel(logging.WARNING)
 
-from flask import Flask, request, jsonify
-from flask_socketio import SocketIO, emit
+# Dipakai untuk menghitung time-to-ready
+PROCESS_STARTED = time.monotonic()
+
+from flask import Flask, Response, request, jsonify, stream_with_context
+from flask_socketio import SocketIO, emit, join_room
 from flask_cors import CORS
-import tensorflow as tf
 import numpy as np
-import soundfile as sf
-import librosa
-from datetime import datetime
-from database import MongoDB
-
-# Create necessary directories
-os.makedirs('data', exist_ok=True)
-os.makedirs('models', exist_ok=True)
+from datetime import datetime, timedelta
+from bson import ObjectId
+from bson.errors import InvalidId
+from database import MongoDB, statistics_summary
+from audio import AudioArchiver, UnsupportedAudioError, decode_audio
+from features import HOP_LENGTH, MAX_LENGTH, extract_features, extract_window_features
+from inference import DEFAULT_MODEL_PATHS, interpret_prediction, interpret_windows, prediction_spread, URGENT_THRESHOLD
+from registry import ModelRegistry
+from streaming import StreamingClassifier
+from cache import ResultCache
+from feature_store import FeatureStore
+from vad import gate_from_env
+from notifier import DetectionNotifier, rooms_for
+from metrics import Counter, Gauge, MetricsRegistry, RequestTimer, RollingWindowCounter
 
 app = Flask(__name__)
 CORS(app, resources={
@@ -39,114 +40,482 @@ CORS(app, resources={
     r"/process_audio": {"origins": "*", "methods": ["POST"]}
 })
 socketio = SocketIO(app, cors_allowed_origins="*")
-db = MongoDB()
 
-logger.info("Loading LSTM model...")
-try:
-    model = tf.keras.models.load_model('models/final_model.h5', compile=False)
-    logger.info("Model loaded successfully")
-except Exception as e:
-    logger.error(f"Error loading model: {e}")
-    raise
+# Komponen yang membuka koneksi, thread atau berkas dibuat oleh init_services(),
+# bukan saat import: proses worker (spawn) mengimpor ulang modul utama
+db = None
+archiver = None
+feature_store = None
+notifier = None
+_init_lock = threading.Lock()
+
+# Record ditulis lewat buffer write-behind; DB_WRITE_MODE=sync untuk insert langsung
+DB_WRITE_MODE = os.environ.get('DB_WRITE_MODE', 'write_behind')
+# Penyimpanan audio ke disk bersifat opsional dan berjalan di background
+PERSIST_AUDIO = os.environ.get('PERSIST_AUDIO', '1') == '1'
+
+# SERVING_MODE=pool: decode, MFCC dan predict dijalankan di proses worker
+# (INFERENCE_WORKERS, default jumlah core); front end hanya menangani I/O
+SERVING_MODE = os.environ.get('SERVING_MODE', 'thread')
+INFERENCE_WORKERS = int(os.environ.get('INFERENCE_WORKERS', os.cpu_count() or 1)) if SERVING_MODE == 'pool' else 0
+MODEL_BACKEND = os.environ.get('MODEL_BACKEND', 'tflite' if SERVING_MODE == 'pool' else 'keras')
+MODEL_PATH = os.environ.get('MODEL_PATH')
+# Batching inferensi untuk request yang datang bersamaan (0 = nonaktif)
+BATCH_MAX_SIZE = int(os.environ.get('BATCH_MAX_SIZE', 16))
+
+# Fitur MFCC setiap deteksi disimpan untuk re-scoring model baru (opsional)
+FEATURE_STORE_DIR = os.environ.get('FEATURE_STORE_DIR')
+
+# Gate VAD sebelum ekstraksi fitur: clip tanpa suara tidak diproses model,
+# hening di awal/akhir dipotong (VAD_ENABLED=0 = nonaktif)
+vad_gate = gate_from_env(os.environ)
+
+# Event deteksi dikirim ke room 'admins' dan 'user:<id>'; deteksi normal
+# digabung per NOTIFY_BATCH_MS, deteksi darurat dikirim langsung
+NOTIFY_BATCH_MS = float(os.environ.get('NOTIFY_BATCH_MS', 500))
+# Secret untuk token room per user (lihat notifier.user_room_token)
+ROOM_TOKEN_SECRET = os.environ.get('ROOM_TOKEN_SECRET')
+
+# Statistik 24 jam terakhir di memori, diisi awal dari rollup per menit
+detection_window = RollingWindowCounter(window_seconds=24 * 3600, slot_seconds=60)
+
+# Model aktif dikelola registry; versi awal dimuat oleh startup() di background.
+# Route admin (/models, /models/activate) hanya aktif jika ADMIN_TOKEN di-set.
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+ready_event = threading.Event()
+startup_state = {'stage': 'starting', 'error': None, 'time_to_ready_s': None}
+
+
+# Cache hasil untuk audio yang dikirim ulang (RESULT_CACHE_SIZE=0 = nonaktif).
+# Dibuat sebelum registry karena on_model_swap mengosongkannya.
+RESULT_CACHE_SIZE = int(os.environ.get('RESULT_CACHE_SIZE', 1024))
+result_cache = None
+if RESULT_CACHE_SIZE > 0:
+    result_cache = ResultCache(RESULT_CACHE_SIZE, float(os.environ.get('RESULT_CACHE_TTL', 300)))
+
+
+def on_model_swap(serving, previous):
+    # Hasil cache milik versi lama tidak akan pernah dipakai lagi
+    if result_cache is not None:
+        result_cache.clear()
+    if previous is not None:
+        logger.info(f"Swapped model {previous.version} -> {serving.version}")
+
+
+registry = ModelRegistry(
+    'models',
+    batch_max_size=BATCH_MAX_SIZE,
+    batch_max_wait_ms=float(os.environ.get('BATCH_MAX_WAIT_MS', 5)),
+    tflite_threads=int(os.environ.get('TFLITE_THREADS', 1)),
+    # Jumlah interpreter TFLite yang dipakai bersama semua thread request
+    tflite_pool_size=int(os.environ.get('TFLITE_POOL_SIZE', 0)) or None,
+    workers=INFERENCE_WORKERS,
+    vad=vad_gate,
+    on_swap=on_model_swap,
+    logger=logger
+)
+
+
+def seed_detection_window():
+    try:
+        since = datetime.now() - timedelta(seconds=detection_window.window_seconds)
+        for bucket in db.rollup_buckets('minute', since):
+            detection_window.seed(bucket['_id'].timestamp(), bucket)
+    except Exception as e:
+        logger.error(f"Error seeding detection statistics from rollups: {e}")
+
+
+def startup():
+    """
+    Fase startup: memuat dan warm-up versi model awal lewat registry.
+    /ready baru mengembalikan 200 setelah fase ini selesai.
+    """
+    try:
+        startup_state['stage'] = 'seeding_stats'
+        seed_detection_window()
+        startup_state['stage'] = 'loading_model'
+        version = registry.register(MODEL_BACKEND, MODEL_PATH or DEFAULT_MODEL_PATHS[MODEL_BACKEND])
+        logger.info(f"Loading LSTM model {version}...")
+        registry.activate(version, background=False)
+
+        startup_state['stage'] = 'ready'
+        startup_state['time_to_ready_s'] = round(time.monotonic() - PROCESS_STARTED, 3)
+        ready_event.set()
+        logger.info(f"Server ready in {startup_state['time_to_ready_s']}s (model {version})")
+    except Exception as e:
+        startup_state['stage'] = 'failed'
+        startup_state['error'] = str(e)
+        logger.error(f"Startup failed: {e}", exc_info=True)
+
+
+def init_services(database=None):
+    """
+    Membuat database, penyimpanan audio, feature store dan notifier, lalu
+    menjalankan startup dan pembuatan index di background. Dipanggil sekali
+    oleh proses server (lihat main()) atau oleh host yang mengimpor app;
+    `database` dapat diisi MongoDB yang sudah dibuat (misalnya mongomock).
+    """
+    global db, archiver, feature_store, notifier
+    with _init_lock:
+        if db is not None:
+            return
+        os.makedirs('data', exist_ok=True)
+        os.makedirs('models', exist_ok=True)
+        if not ADMIN_TOKEN:
+            logger.warning("ADMIN_TOKEN is not set; admin routes will return 403")
+
+        archiver = AudioArchiver('data', logger=logger) if PERSIST_AUDIO else None
+        if FEATURE_STORE_DIR:
+            feature_store = FeatureStore(FEATURE_STORE_DIR)
+            atexit.register(feature_store.close)
+        notifier = DetectionNotifier(socketio.emit, batch_interval=NOTIFY_BATCH_MS / 1000, logger=logger)
+        atexit.register(notifier.close)
+        # Index dibuat di background agar tidak menahan startup
+        db = database or MongoDB(logger=logger, write_mode=DB_WRITE_MODE, ensure_indexes=False)
+        atexit.register(db.close_connection)
+
+        threading.Thread(target=startup, name='startup', daemon=True).start()
+        threading.Thread(target=db.ensure_indexes, name='ensure-indexes', daemon=True).start()
+
+# Metrik proses untuk endpoint /metrics (format teks Prometheus)
+metrics_registry = MetricsRegistry()
+stage_seconds = metrics_registry.histogram(
+    'process_audio_stage_seconds', 'Time spent in each process_audio stage', ['stage'])
+requests_total = metrics_registry.counter('process_audio_requests_total', 'Audio classification requests')
+errors_total = metrics_registry.counter('process_audio_errors_total', 'Failed audio classification requests', ['reason'])
+urgent_total = metrics_registry.counter('process_audio_urgent_total', 'Requests classified as urgent')
+vad_gated_total = metrics_registry.counter('vad_gated_total', 'Clips skipped by the VAD gate as containing no speech')
+vad_trimmed_seconds = metrics_registry.counter('vad_trimmed_seconds_total', 'Leading/trailing silence trimmed before feature extraction')
+
+
+def collect_component_metrics():
+    """
+    Metrik dari model, scheduler, cache dan buffer database saat /metrics dipanggil
+    """
+    serving = registry.active
+    model_info = Gauge('model_info', 'Currently served model', ['version', 'backend'])
+    if serving is not None:
+        model_info.set(1, version=serving.version, backend=serving.backend.name)
+    urgent_ratio = Gauge('process_audio_urgent_ratio', 'Share of successful requests classified as urgent')
+    served = requests_total.total() - errors_total.total()
+    urgent_ratio.set(urgent_total.value() / served if served > 0 else 0.0)
+    collected = [model_info, urgent_ratio]
+
+    if serving is not None and serving.scheduler is not None:
+        stats = serving.scheduler.stats()
+        batches = Counter('inference_batches_total', 'Prediction batches executed')
+        batches.inc(stats['batches_total'])
+        batch_sizes = Counter('inference_batch_size_total', 'Executed batches by batch size', ['size'])
+        for size, count in stats['batch_size_counts'].items():
+            batch_sizes.inc(count, size=size)
+        wait_total = Counter('inference_queue_wait_seconds_total', 'Total time requests waited for a batch')
+        wait_total.inc(stats['queue_wait_seconds_total'])
+        wait_max = Gauge('inference_queue_wait_seconds_max', 'Longest time a request waited for a batch')
+        wait_max.set(stats['queue_wait_seconds_max'])
+        depth = Gauge('inference_queue_depth', 'Requests waiting for a batch')
+        depth.set(stats['queue_depth'])
+        collected += [batches, batch_sizes, wait_total, wait_max, depth]
+
+    if result_cache is not None:
+        stats = result_cache.stats()
+        cache_lookups = Counter('result_cache_lookups_total', 'Result cache lookups', ['result'])
+        cache_lookups.inc(stats['hits'], result='hit')
+        cache_lookups.inc(stats['misses'], result='miss')
+        cache_size = Gauge('result_cache_entries', 'Entries in the result cache')
+        cache_size.set(stats['size'])
+        collected += [cache_lookups, cache_size]
+
+    if feature_store is not None:
+        store_rows = Gauge('feature_store_rows', 'MFCC tensors in the feature store')
+        store_rows.set(feature_store.count)
+        collected.append(store_rows)
+
+    if notifier is not None:
+        notifications = Counter('detection_notifications_total', 'Detection events published to Socket.IO clients', ['delivery'])
+        for delivery in ('immediate', 'batched', 'dropped'):
+            notifications.inc(notifier.stats[delivery], delivery=delivery)
+        collected.append(notifications)
+
+    if db is not None and db.writer is not None:
+        db_writes = Gauge('db_write_behind_records', 'Write-behind buffer record counts', ['state'])
+        for state in ('written', 'dropped'):
+            db_writes.set(db.writer.stats[state], state=state)
+        db_writes.set(db.writer.pending(), state='pending')
+        collected.append(db_writes)
+    return collected
+
+
+metrics_registry.register_collector(collect_component_metrics)
+
+
+def cached_classification(key_data, serving, compute):
+    """
+    Hasil klasifikasi dari cache jika `key_data` yang sama sudah pernah
+    diproses dengan versi model yang sama; selain itu compute() dipanggil
+    dan harus mengembalikan (baris prediksi, fitur), atau None jika clip tidak
+    berisi suara. Fitur ikut di-cache agar tetap bisa masuk feature store.
+    Mengembalikan (is_urgent, confidence, spread, features, cached), atau None tanpa suara.
+    """
+    cache_key = None
+    if result_cache is not None:
+        cache_key = ResultCache.key(key_data, serving.version)
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            return cached + (True,)
+
+    computed = compute()
+    if computed is None:
+        return None
+    prediction, features = computed
+    is_urgent, confidence = interpret_prediction(prediction)
+    result = (is_urgent, confidence, prediction_spread(prediction), features)
+    if cache_key is not None:
+        result_cache.put(cache_key, result)
+    return result + (False,)
+
+
+def record_vad(duration, speech_duration):
+    if speech_duration is None:
+        vad_gated_total.inc()
+    else:
+        vad_trimmed_seconds.inc(max(0.0, duration - speech_duration))
+
+
+def classify_audio(audio_data, sr, serving, timer=None):
+    """
+    Klasifikasi audio hasil decode dengan versi model `serving`;
+    None jika gate VAD menilai clip tidak berisi suara
+    """
+    timer = timer or RequestTimer(stage_seconds)
+
+    def compute():
+        nonlocal audio_data
+        if vad_gate is not None:
+            with timer.stage('vad'):
+                speech = vad_gate.apply(audio_data, sr)
+            record_vad(len(audio_data) / sr, None if speech is None else len(speech) / sr)
+            if speech is None:
+                return None
+            audio_data = speech
+        with timer.stage('features'):
+            features = extract_features(audio_data, sr)
+        with timer.stage('predict'):
+            return serving.predict(features), features
+
+    return cached_classification(audio_data, serving, compute)
+
+
+def score_long_audio(audio_bytes, serving, timer, log):
+    """
+    Mode rekaman panjang: seluruh rekaman dinilai per jendela 94 frame yang
+    saling tumpang tindih dalam satu predict.
+    Mengembalikan (is_urgent, confidence, timeline), atau None tanpa suara.
+    """
+    if serving.remote:
+        with timer.stage('worker'):
+            predictions, starts, duration = serving.score_windows_bytes(audio_bytes)
+        sr = 16000
+    else:
+        with timer.stage('decode'):
+            audio_data, sr = decode_audio(audio_bytes, target_sr=16000)
+        duration = len(audio_data) / sr
+        predictions = None
+        if vad_gate is None or vad_gate.speech_bounds(audio_data, sr) is not None:
+            with timer.stage('features'):
+                features, starts = extract_window_features(audio_data, sr)
+            with timer.stage('predict'):
+                predictions = serving.predict_batch(features)
+    log['duration_s'] = round(duration, 2)
+    if predictions is None:
+        if vad_gate is not None:
+            vad_gated_total.inc()
+        return None
+
+    is_urgent, confidence, confidences = interpret_windows(predictions)
+    frame_seconds = HOP_LENGTH / sr
+    timeline = [{
+        'start_s': round(start * frame_seconds, 3),
+        'end_s': round(min((start + MAX_LENGTH) * frame_seconds, duration), 3),
+        'confidence': float(score),
+        'is_urgent': bool(score > URGENT_THRESHOLD)
+    } for start, score in zip(starts.tolist(), confidences)]
+    log['windows'] = len(timeline)
+    return is_urgent, confidence, timeline
+
+
+def save_detection(record):
+    """
+    Menyimpan record deteksi (beserta rollup-nya) dan memperbarui statistik di memori
+    """
+    record_id = db.save_record(record)
+    detection_window.add(record['is_urgent'], record.get('confidence'), record['timestamp'].timestamp())
+    return record_id
+
+
+def not_ready_response():
+    return jsonify({'error': 'Model not ready', 'stage': startup_state['stage']}), 503
+
+
+def no_speech_response(log, timer):
+    log.update({
+        'status': 200,
+        'result': 'no_speech',
+        'stages_ms': timer.timings,
+        'total_ms': timer.total_ms()
+    })
+    logger.info(json.dumps(log))
+    return jsonify({
+        'status': 'no_speech',
+        'is_urgent': False,
+        'confidence': None,
+        'cached': False
+    })
 
 
 @app.route('/process_audio', methods=['POST'])
 def process_audio():
-    logger.info("\n=== Starting new audio processing request ===")
-    logger.info(f"Request method: {request.method}")
-    logger.info(f"Request headers: {dict(request.headers)}")
-    logger.info(f"Request files keys: {list(request.files.keys())}")
-    logger.info(f"Request form keys: {list(request.form.keys())}")
+    if not ready_event.is_set():
+        return not_ready_response()
+    # Versi model dipegang selama request: satu request tidak tercampur dua
+    # versi saat swap, dan versi lama baru ditutup setelah request selesai
+    with registry.acquire() as serving:
+        return classify_upload(serving)
+
+
+def classify_upload(serving):
+    timer = RequestTimer(stage_seconds)
+    log = {'event': 'process_audio'}
+    requests_total.inc()
     
     if 'audio' not in request.files:
+        errors_total.inc(reason='no_audio')
         logger.error("No audio file received in request.files")
-        logger.error(f"Available files: {request.files}")
         return jsonify({'error': 'No audio file'}), 400
     
     try:
         audio_file = request.files['audio']
         if not audio_file.filename:
+            errors_total.inc(reason='empty_filename')
             logger.error("Empty filename received")
             return jsonify({'error': 'Empty filename'}), 400
-            
-        logger.info(f"Audio file received: {audio_file.filename}")
         
         user_id = request.form.get('user_id', 'default_user')
-        logger.info(f"Processing audio for user: {user_id}")
-        
-        temp_path = os.path.join('data', f'temp_{user_id}.wav')
-        audio_file.save(temp_path)
-        logger.info(f"Audio saved to: {temp_path}")
+        log['user_id'] = user_id
+        # mode=long: rekaman dinilai per jendela, bukan hanya 94 frame pertama
+        mode = request.form.get('mode', 'clip')
+        if mode not in ('clip', 'long'):
+            errors_total.inc(reason='invalid_mode')
+            return jsonify({'error': f'Unknown mode: {mode}'}), 400
+        log['mode'] = mode
         
-        # Verify file exists and size
-        file_size = os.path.getsize(temp_path)
-        logger.info(f"Saved file size: {file_size} bytes")
+        with timer.stage('read'):
+            audio_bytes = audio_file.read()
+        log['bytes'] = len(audio_bytes)
         
-        audio_data, sr = librosa.load(temp_path, sr=16000)
-        logger.info(f"Audio loaded: duration={len(audio_data)/sr:.2f}s, sr={sr}Hz, shape={audio_data.shape}")
+        audio_path = None
+        if archiver is not None:
+            with timer.stage('save'):
+                audio_path = archiver.path_for(user_id, audio_file.filename)
+                archiver.submit(audio_bytes, audio_path)
         
-        features = extract_features(audio_data, sr)
-        logger.info(f"Features extracted: shape={features.shape}")
+        timeline = None
+        if mode == 'long':
+            result = score_long_audio(audio_bytes, serving, timer, log)
+            if result is not None:
+                is_urgent, confidence, timeline = result
+                result = (is_urgent, confidence, None, None, False)
+        elif serving.remote:
+            # Seluruh pekerjaan CPU dijalankan di proses worker
+            def compute():
+                with timer.stage('worker'):
+                    prediction, features, duration, speech_duration = serving.classify_bytes(audio_bytes)
+                log['duration_s'] = round(duration, 2)
+                if vad_gate is not None:
+                    record_vad(duration, speech_duration)
+                return None if prediction is None else (prediction, features)
+            result = cached_classification(audio_bytes, serving, compute)
+        else:
+            with timer.stage('decode'):
+                audio_data, sr = decode_audio(audio_bytes, target_sr=16000)
+            log['duration_s'] = round(len(audio_data) / sr, 2)
+            result = classify_audio(audio_data, sr, serving, timer)
         
-        logger.info("Making prediction...")
-        prediction = model.predict(features, verbose=0)
-        is_urgent = bool(prediction[0][0] > 0.5)
-        confidence = float(prediction[0][0])
-        logger.info(f"Prediction complete: Urgent={is_urgent}, Confidence={confidence:.2%}")
+        if result is None:
+            return no_speech_response(log, timer)
+        is_urgent, confidence, spread, features, cached = result
         
         record = {
             'user_id': user_id,
             'timestamp': datetime.now(),
-            'audio_path': temp_path,
+            'audio_path': audio_path,
             'is_urgent': is_urgent,
-            'confidence': confidence
+            'confidence': confidence,
+            'model_version': serving.version
         }
+        if spread is not None:
+            record['fold_spread'] = spread
+        if timeline is not None:
+            record['mode'] = 'long'
+            record['urgent_segments'] = [
+                [segment['start_s'], segment['end_s']] for segment in timeline if segment['is_urgent']
+            ]
         
-        db.save_record(record)
-        logger.info(f"Record saved to database: {record}")
+        with timer.stage('db'):
+            record_id = save_detection(record)
         
-        socketio.emit('new_detection', record)
-        logger.info("WebSocket notification sent")
+        if feature_store is not None and features is not None:
+            with timer.stage('feature_store'):
+                feature_store.append(record_id, features[0])
         
-        logger.info("=== Audio processing completed successfully ===\n")
-        return jsonify({
-            'status': 'success',
+        with timer.stage('emit'):
+            notifier.publish(record)
+        
+        if is_urgent:
+            urgent_total.inc()
+        log.update({
+            'status': 200,
             'is_urgent': is_urgent,
-            'confidence': confidence
+            'confidence': round(confidence, 4),
+            'cached': cached,
+            'model_version': serving.version,
+            'stages_ms': timer.timings,
+            'total_ms': timer.total_ms()
         })
+        logger.info(json.dumps(log))
         
+        response = {
+            'status': 'success',
+            'is_urgent': is_urgent,
+            'confidence': confidence,
+            'cached': cached
+        }
+        if spread is not None:
+            response['fold_spread'] = spread
+        if timeline is not None:
+            response['timeline'] = timeline
+        return jsonify(response)
+        
+    except UnsupportedAudioError as e:
+        errors_total.inc(reason='unsupported_format')
+        logger.error(f"Unsupported audio upload: {e}")
+        return jsonify({'error': str(e)}), 415
     except Exception as e:
+        errors_total.inc(reason='exception')
         logger.error(f"Error processing audio: {str(e)}", exc_info=True)
         return jsonify({'error': str(e)}), 500
 
-# Tambahkan normalisasi MFCC seperti saat training
-def extract_features(audio_data, sr=16000):
-    mfcc = librosa.feature.mfcc(
-        y=audio_data, 
-        sr=sr,
-        n_mfcc=13,
-        n_fft=2048,
-        hop_length=512
-    )
-    # Tambahkan normalisasi
-    mfcc = (mfcc - np.mean(mfcc)) / np.std(mfcc)
-    mfcc = mfcc.T
-    
-    # Pastikan padding sesuai dengan training
-    max_length = 94  # Sesuaikan dengan panjang saat training
-    if mfcc.shape[0] < max_length:
-        pad_width = max_length - mfcc.shape[0]
-        mfcc = np.pad(mfcc, ((0, pad_width), (0, 0)), 
-                      mode='constant')
-    else:
-        mfcc = mfcc[:max_length, :]
-    
-    return np.expand_dims(mfcc, axis=0)
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
 
 # Add this new route after your existing routes
 @app.route('/test_model', methods=['GET'])
 def test_model():
     logger.info("=== Testing model prediction ===")
+    if not ready_event.is_set():
+        return not_ready_response()
     try:
         # Load a test audio file
         test_path = 'data/temp_default_user.wav'
@@ -154,13 +523,15 @@ def test_model():
             logger.error(f"Test file not found: {test_path}")
             return jsonify({'error': 'Test file not found'}), 404
             
-        audio_data, sr = librosa.load(test_path, sr=16000)
+        with open(test_path, 'rb') as f:
+            audio_data, sr = decode_audio(f.read(), target_sr=16000)
         logger.info(f"Test audio loaded: duration={len(audio_data)/sr:.2f}s, sr={sr}Hz")
         
         features = extract_features(audio_data, sr)
         logger.info(f"Test features extracted: shape={features.shape}")
         
-        prediction = model.predict(features, verbose=0)
+        with registry.acquire() as serving:
+            prediction = serving.predict(features)[None]
         is_urgent = bool(np.argmax(prediction[0]) == 1)  # Gunakan argmax
         confidence = float(prediction[0][1])  # Ambil probabilitas kelas 1 (darurat)
         logger.info(f"Test prediction: Urgent={is_urgent}, Confidence={confidence:.2%}")
@@ -175,40 +546,175 @@ def test_model():
         logger.error(f"Error in test route: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/inference_stats', methods=['GET'])
+def inference_stats():
+    if not ready_event.is_set():
+        return not_ready_response()
+    serving = registry.active
+    stats = serving.scheduler.stats() if serving.scheduler is not None else {}
+    stats['backend'] = serving.backend.name
+    stats['model_path'] = serving.backend.model_path
+    stats['model_version'] = serving.version
+    if result_cache is not None:
+        stats['result_cache'] = result_cache.stats()
+    if serving.remote:
+        stats['worker_memory'] = {str(pid): memory for pid, memory in serving.memory().items()}
+    return jsonify(stats)
+
 # Add this new test endpoint
 @app.route('/test', methods=['GET'])
 def test():
     logger.info("Test endpoint called")
     return jsonify({'status': 'Server is running'})
 
-@app.route('/user_history/<user_id>', methods=['GET'])
-def get_user_history(user_id):
+# Readiness probe, terpisah dari liveness /test
+@app.route('/ready', methods=['GET'])
+def ready():
+    body = {
+        'ready': ready_event.is_set(),
+        'stage': startup_state['stage'],
+        'model_version': registry.active.version if registry.active else None,
+        'time_to_ready_s': startup_state['time_to_ready_s']
+    }
+    if startup_state['error']:
+        body['error'] = startup_state['error']
+    return jsonify(body), 200 if body['ready'] else 503
+
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    """
+    Statistik deteksi untuk `hours` terakhir: sampai 24 jam dari counter di
+    memori, lebih dari itu dari rollup per jam/menit di MongoDB
+    """
     try:
-        logger.info(f"Attempting to fetch history for user: {user_id}")
-        
-        # Add database connection check
+        hours = hours_param()
+    except ValueError as e:
+        return jsonify({'error': f'Invalid hours parameter: {e}'}), 400
+    try:
+        if hours * 3600 <= detection_window.window_seconds:
+            result = statistics_summary(detection_window.totals(hours * 3600), hours)
+            result['source'] = 'memory'
+        else:
+            result = db.get_statistics(hours)
+            result['source'] = 'rollup'
+        return jsonify(result)
+    except Exception as e:
+        logger.error(f"Error getting statistics: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+def is_admin():
+    # Fail closed: tanpa ADMIN_TOKEN semua route admin ditolak
+    if not ADMIN_TOKEN:
+        return False
+    return hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN)
+
+
+@app.route('/models', methods=['GET'])
+def list_models():
+    if not is_admin():
+        return jsonify({'error': 'Forbidden'}), 403
+    try:
+        return jsonify(registry.status())
+    except Exception as e:
+        logger.error(f"Error listing models: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/models/activate', methods=['POST'])
+def activate_model():
+    """
+    Memuat dan warm-up versi model di background lalu menukarnya secara atomik.
+    Status swap dapat dipantau lewat GET /models.
+    """
+    if not is_admin():
+        return jsonify({'error': 'Forbidden'}), 403
+    version = (request.get_json(silent=True) or {}).get('version') or request.form.get('version')
+    if not version:
+        return jsonify({'error': 'Missing version'}), 400
+    try:
+        registry.activate(version)
+        logger.info(f"Model activation requested: {version}")
+        return jsonify({'status': 'loading', 'version': version}), 202
+    except KeyError:
+        return jsonify({'error': f'Unknown model version: {version}'}), 404
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        logger.error(f"Error activating model: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+PAGE_SIZE_DEFAULT = 100
+PAGE_SIZE_MAX = 1000
+
+
+def encode_cursor(record):
+    return f"{record['timestamp'].isoformat()}_{record['_id']}"
+
+
+def decode_cursor(token):
+    """
+    Cursor keyset berbentuk '<timestamp ISO>_<ObjectId>'
+    """
+    if not token:
+        return None
+    timestamp, record_id = token.rsplit('_', 1)
+    return datetime.fromisoformat(timestamp), ObjectId(record_id)
+
+
+def hours_param(default=24):
+    # Jendela waktu dalam jam; harus angka positif yang terbatas
+    hours = float(request.args.get('hours', default))
+    if not math.isfinite(hours) or hours <= 0:
+        raise ValueError(f'must be a positive number of hours, got {hours}')
+    return hours
+
+
+def page_params():
+    limit = min(max(int(request.args.get('limit', PAGE_SIZE_DEFAULT)), 1), PAGE_SIZE_MAX)
+    return limit, decode_cursor(request.args.get('cursor'))
+
+
+def serialize_record(record):
+    record['_id'] = str(record['_id'])
+    record['timestamp'] = record['timestamp'].strftime('%Y-%m-%d %H:%M:%S')
+    return json.dumps(record)
+
+
+def stream_page(cursor, limit):
+    """
+    Response JSON {"items": [...], "next_cursor": ...} yang diserialisasi per
+    dokumen langsung dari cursor Mongo
+    """
+    # Dokumen pertama diambil sebelum streaming agar error koneksi tetap jadi 500
+    first = next(cursor, None)
+
+    def generate():
+        yield '{"items":['
+        record, count, last_cursor = first, 0, None
         try:
-            db.client.admin.command('ping')
-            logger.info("Database connection active")
+            while record is not None:
+                last_cursor = encode_cursor(record)
+                yield (',' if count else '') + serialize_record(record)
+                count += 1
+                record = next(cursor, None)
         except Exception as e:
-            logger.error("Database connection failed")
-            raise
-        
-        history = db.get_user_history(user_id)
-        logger.info(f"Raw database response: {history}")
-        
-        if not history:
-            logger.info("No history found for user")
-            return jsonify([])
-            
-        # Convert MongoDB objects
-        for record in history:
-            record['_id'] = str(record['_id'])
-            record['timestamp'] = record['timestamp'].strftime('%Y-%m-%d %H:%M:%S')
-        
-        logger.info(f"Processed history: {history}")
-        return jsonify(history)
-        
+            logger.error(f"Error streaming records: {e}", exc_info=True)
+        next_cursor = last_cursor if count == limit else None
+        yield '],"next_cursor":' + json.dumps(next_cursor) + '}'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+
+@app.route('/user_history/<user_id>', methods=['GET'])
+def get_user_history(user_id):
+    try:
+        limit, before = page_params()
+    except (ValueError, InvalidId) as e:
+        return jsonify({'error': f'Invalid pagination parameters: {e}'}), 400
+    try:
+        return stream_page(db.iter_user_history(user_id, limit, before), limit)
     except Exception as e:
         logger.error(f"Error in get_user_history: {str(e)}", exc_info=True)
         return jsonify({'error': str(e)}), 500
@@ -216,16 +722,135 @@ def get_user_history(user_id):
 @app.route('/urgent_cases', methods=['GET'])
 def get_urgent_cases():
     try:
-        urgent_cases = db.get_all_urgent()
-        for record in urgent_cases:
-            record['_id'] = str(record['_id'])  # Convert ObjectId
-            record['timestamp'] = record['timestamp'].strftime('%Y-%m-%d %H:%M:%S')
-        return jsonify(urgent_cases)
+        limit, before = page_params()
+        hours = hours_param()
+    except (ValueError, InvalidId) as e:
+        return jsonify({'error': f'Invalid pagination parameters: {e}'}), 400
+    try:
+        return stream_page(db.iter_urgent(hours, limit, before), limit)
     except Exception as e:
         logger.error(f"Error fetching urgent cases: {e}")
         return jsonify({'error': str(e)}), 500
 
-if __name__ == '__main__':
+# Streaming klasifikasi real-time: klien mengirim potongan PCM 16 kHz
+STREAM_NAMESPACE = '/stream'
+STREAM_EMIT_EVERY = int(os.environ.get('STREAM_EMIT_EVERY', 8))
+STREAM_MAX_CHUNK_BYTES = 1024 * 1024
+streams = {}
+
+
+@socketio.on('connect')
+def on_connect(auth=None):
+    """
+    Dashboard dengan ADMIN_TOKEN masuk ke room 'admins'; klien user dengan
+    token dari user_room_token(ROOM_TOKEN_SECRET, user_id) masuk ke room
+    'user:<id>' sehingga hanya menerima deteksinya sendiri
+    """
+    rooms = rooms_for(auth or request.args.to_dict(), ADMIN_TOKEN, ROOM_TOKEN_SECRET)
+    for room in rooms:
+        join_room(room)
+    logger.info(f"Socket.IO client {request.sid} joined {rooms}")
+
+
+@socketio.on('start', namespace=STREAM_NAMESPACE)
+def stream_start(data=None):
+    if not ready_event.is_set():
+        emit('stream_error', {'error': 'Model not ready'})
+        return
+    data = data or {}
+    sample_rate = int(data.get('sample_rate', 16000))
+    if sample_rate != 16000:
+        emit('stream_error', {'error': 'Only 16 kHz PCM is supported'})
+        return
+    try:
+        stream = StreamingClassifier(
+            emit_every=int(data.get('emit_every', STREAM_EMIT_EVERY)),
+            pcm_format=data.get('format', 'int16')
+        )
+    except ValueError as e:
+        emit('stream_error', {'error': str(e)})
+        return
+    streams[request.sid] = {
+        'classifier': stream,
+        'user_id': data.get('user_id', 'default_user'),
+        'urgent': False
+    }
+    logger.info(f"Stream started: sid={request.sid}")
+    emit('stream_started', {'sample_rate': sample_rate, 'window_frames': stream.window_frames})
+
+
+@socketio.on('audio_chunk', namespace=STREAM_NAMESPACE)
+def stream_chunk(chunk):
+    session = streams.get(request.sid)
+    if session is None:
+        emit('stream_error', {'error': 'Stream not started'})
+        return
+    if not isinstance(chunk, (bytes, bytearray)) or len(chunk) > STREAM_MAX_CHUNK_BYTES:
+        emit('stream_error', {'error': 'Invalid audio chunk'})
+        return
+    try:
+        stream = session['classifier']
+        features = stream.push(bytes(chunk))
+        if features is None:
+            return
+        with registry.acquire() as serving:
+            is_urgent, confidence = interpret_prediction(serving.predict(features))
+        emit('classification', {
+            'is_urgent': is_urgent,
+            'confidence': confidence,
+            'stream_seconds': stream.stream_seconds
+        })
+        # Catat dan broadcast hanya saat status berubah menjadi darurat
+        if is_urgent and not session['urgent']:
+            record = {
+                'user_id': session['user_id'],
+                'timestamp': datetime.now(),
+                'audio_path': None,
+                'is_urgent': True,
+                'confidence': confidence,
+                'model_version': serving.version,
+                'source': 'stream'
+            }
+            save_detection(record)
+            notifier.publish(record)
+        session['urgent'] = is_urgent
+    except Exception as e:
+        logger.error(f"Error processing stream chunk: {e}", exc_info=True)
+        emit('stream_error', {'error': str(e)})
+
+
+@socketio.on('stop', namespace=STREAM_NAMESPACE)
+def stream_stop():
+    streams.pop(request.sid, None)
+    emit('stream_stopped', {})
+
+
+@socketio.on('disconnect', namespace=STREAM_NAMESPACE)
+def stream_disconnect(*args):
+    streams.pop(request.sid, None)
+
+def configure_logging():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('app.log'),
+            logging.StreamHandler()
+        ]
+    )
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    logging.getLogger('tensorflow').setLevel(logging.WARNING)
+    logging.getLogger('pymongo').setLevel(logging.WARNING)
+    logging.getLogger('h5py').setLevel(logging.WARNING)
+
+
+def main():
+    configure_logging()
+    init_services()
     logger.info("Starting Flask application...")
     socketio.run(app, debug=True)
+
+
+if __name__ == '__main__':
+    main()
     
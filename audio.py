@@ -0,0 +1,143 @@
+import io
+import os
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from math import gcd
+
+import numpy as np
+import soundfile as sf
+
+
+# Format upload yang didukung: (format soundfile, subtype, ekstensi, MIME)
+UPLOAD_FORMATS = {
+    'wav': ('WAV', 'PCM_16', '.wav', 'audio/wav'),
+    'flac': ('FLAC', 'PCM_16', '.flac', 'audio/flac'),
+    'opus': ('OGG', 'OPUS', '.ogg', 'audio/ogg')
+}
+
+
+# Resampler untuk upload yang sample rate-nya bukan 16 kHz: 'soxr_vhq',
+# 'soxr_hq', 'soxr_mq', 'soxr_lq' (libsoxr) atau 'polyphase' (scipy).
+# Default tetap soxr_hq (sama dengan librosa, MFCC identik): libsoxr sudah
+# polyphase dan penghematan decode berasal dari melewati loader librosa.
+# Menurut bagian decode di benchmark.py (44.1 kHz stereo 5 detik) soxr_mq
+# tidak lebih cepat secara terukur (~4.1 ms keduanya) tetapi MFCC-nya
+# bergeser ~0.1%, dan 'polyphase' (scipy) ~2x lebih lambat dengan selisih ~0.5%.
+RESAMPLE_TYPE = os.environ.get('RESAMPLE_TYPE', 'soxr_hq')
+# Jumlah frame per blok saat down-mix multi-channel
+DOWNMIX_BLOCK_FRAMES = 65536
+
+
+class UnsupportedAudioError(ValueError):
+    pass
+
+
+def encode_audio(audio, sr=16000, fmt='flac'):
+    """
+    Encode buffer audio ke bytes untuk upload. FLAC lossless (sampel PCM 16-bit
+    identik dengan WAV), Opus lossy tetapi paling kecil.
+    Mengembalikan (bytes, nama file, MIME).
+    """
+    if fmt not in UPLOAD_FORMATS:
+        raise ValueError(f"Unknown upload format: {fmt}")
+    container, subtype, ext, mime = UPLOAD_FORMATS[fmt]
+    buffer = io.BytesIO()
+    sf.write(buffer, audio, sr, format=container, subtype=subtype)
+    return buffer.getvalue(), f'audio{ext}', mime
+
+
+def resample(audio, orig_sr, target_sr, res_type=None):
+    """
+    Resampling polyphase float32: libsoxr (default) atau scipy resample_poly
+    """
+    res_type = res_type or RESAMPLE_TYPE
+    if res_type.startswith('soxr_'):
+        import soxr
+        audio = soxr.resample(audio, orig_sr, target_sr, quality=res_type[len('soxr_'):].upper())
+    elif res_type == 'polyphase':
+        from scipy.signal import resample_poly
+        factor = gcd(int(orig_sr), int(target_sr))
+        audio = resample_poly(audio, target_sr // factor, orig_sr // factor)
+    else:
+        raise ValueError(f"Unknown resample type: {res_type}")
+    return audio.astype(np.float32, copy=False)
+
+
+def _read_mono(f):
+    """
+    Membaca SoundFile sebagai float32 mono. Multi-channel di-down-mix per blok
+    ke buffer mono sehingga array (frames, channels) penuh tidak pernah dibuat.
+    """
+    if f.channels == 1:
+        return f.read(dtype='float32')
+    mono = np.empty(max(f.frames, 0), dtype=np.float32)
+    block = np.empty((DOWNMIX_BLOCK_FRAMES, f.channels), dtype=np.float32)
+    filled = 0
+    while True:
+        frames = f.read(out=block)
+        if not len(frames):
+            break
+        if filled + len(frames) > len(mono):
+            mono = np.resize(mono, filled + len(frames))
+        # Penjumlahan per kolom jauh lebih cepat dari np.mean(axis=1) pada baris
+        # sempit, dengan urutan operasi (dan hasil) yang sama
+        out = mono[filled:filled + len(frames)]
+        np.copyto(out, frames[:, 0])
+        for channel in range(1, f.channels):
+            out += frames[:, channel]
+        out /= f.channels
+        filled += len(frames)
+    return mono[:filled]
+
+
+def decode_audio(data, target_sr=16000, res_type=None):
+    """
+    Decode audio (WAV, FLAC, Ogg Vorbis/Opus) langsung dari bytes upload ke
+    buffer float32 mono, tanpa menulis file sementara. Sample rate dibaca dari
+    header; audio yang sudah target_sr tidak di-resample sama sekali.
+    """
+    try:
+        with sf.SoundFile(io.BytesIO(data)) as f:
+            sr = f.samplerate
+            audio = _read_mono(f)
+    except sf.LibsndfileError as e:
+        raise UnsupportedAudioError(f"Unsupported or corrupt audio: {e}") from e
+    if sr != target_sr:
+        audio = resample(audio, sr, target_sr, res_type)
+        sr = target_sr
+    return audio, sr
+
+
+class AudioArchiver:
+    def __init__(self, directory='data', max_workers=1, logger=None):
+        """
+        Menyimpan audio upload ke disk di thread terpisah, di luar jalur request
+        """
+        self.directory = directory
+        self.logger = logger or logging.getLogger(__name__)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='audio-archiver')
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, user_id, filename=None):
+        """
+        Nama file unik per upload agar upload bersamaan tidak saling menimpa
+        """
+        ext = os.path.splitext(filename or '')[1].lower() or '.wav'
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        return os.path.join(self.directory, f'{user_id}_{stamp}_{uuid.uuid4().hex[:8]}{ext}')
+
+    def submit(self, data, path):
+        return self._executor.submit(self._write, data, path)
+
+    def _write(self, data, path):
+        try:
+            with open(path, 'wb') as f:
+                f.write(data)
+        except Exception as e:
+            self.logger.error(f"Error archiving audio to {path}: {e}")
+            raise
+
+    def close(self):
+        self._executor.shutdown(wait=True)
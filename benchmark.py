@@ -0,0 +1,252 @@
+import os
+import io
+import sys
+import json
+import time
+import platform
+import resource
+import argparse
+
+import numpy as np
+import soundfile as sf
+import librosa
+
+from audio import decode_audio, encode_audio
+from features import extract_features, extract_features_batch
+
+SAMPLE_RATE = 16000
+CLIP_SECONDS = (1, 3, 5, 10)
+UPLOAD_FORMATS = ('wav', 'flac', 'opus')
+# Upload rekaman 44.1 kHz stereo untuk membandingkan resampler
+RESAMPLE_TYPES = ('soxr_hq', 'soxr_mq', 'polyphase')
+# Kecepatan uplink klien mobile yang dipakai untuk estimasi waktu upload
+UPLINK_MBPS = 1.0
+BATCH_SIZES = (1, 2, 4, 8, 16, 32, 64)
+WORKER_COUNTS = (1, 2, 4, 8)
+
+
+def synthetic_clip(seconds, sr=SAMPLE_RATE, seed=0):
+    """
+    Clip sintetis: nada harmonik dengan amplitudo berubah plus noise
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sr)) / sr
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 1.5 * t)
+    tone = sum(np.sin(2 * np.pi * f * t) / (i + 1) for i, f in enumerate((220, 440, 880)))
+    clip = 0.2 * envelope * tone + 0.02 * rng.standard_normal(len(t))
+    return clip.astype(np.float32)
+
+
+def wav_bytes(clip, sr=SAMPLE_RATE, fmt='WAV', subtype='PCM_16'):
+    buffer = io.BytesIO()
+    sf.write(buffer, clip, sr, format=fmt, subtype=subtype)
+    return buffer.getvalue()
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def measure(fn, repeats, warmup=3, items=1):
+    """
+    Menjalankan fn berulang kali; mengembalikan persentil latensi (ms),
+    throughput (item/detik) dan peak RSS
+    """
+    for _ in range(warmup):
+        fn()
+    timings = np.empty(repeats)
+    for i in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings[i] = time.perf_counter() - started
+    return {
+        'p50_ms': float(np.percentile(timings, 50) * 1000),
+        'p95_ms': float(np.percentile(timings, 95) * 1000),
+        'p99_ms': float(np.percentile(timings, 99) * 1000),
+        'throughput_per_sec': float(items * repeats / timings.sum()),
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def bench_decode(results, repeats):
+    for seconds in CLIP_SECONDS:
+        data = wav_bytes(synthetic_clip(seconds))
+        baseline = results[f'decode/librosa_load/{seconds}s'] = measure(
+            lambda: librosa.load(io.BytesIO(data), sr=SAMPLE_RATE), repeats)
+        result = results[f'decode/decode_audio/{seconds}s'] = measure(
+            lambda: decode_audio(data, target_sr=SAMPLE_RATE), repeats)
+        # Latensi per request yang dihemat fast path 16 kHz mono
+        result['saved_vs_librosa_p50_ms'] = baseline['p50_ms'] - result['p50_ms']
+
+    clip = librosa.resample(synthetic_clip(5), orig_sr=SAMPLE_RATE, target_sr=44100)
+    data = wav_bytes(np.stack([clip, clip], axis=1), sr=44100)
+    baseline = results['decode/librosa_load/44k_stereo/5s'] = measure(
+        lambda: librosa.load(io.BytesIO(data), sr=SAMPLE_RATE), repeats)
+    # Paritas MFCC setiap resampler terhadap jalur librosa.load lama
+    reference = extract_features(librosa.load(io.BytesIO(data), sr=SAMPLE_RATE)[0], SAMPLE_RATE)
+    for res_type in RESAMPLE_TYPES:
+        result = results[f'decode/decode_audio/44k_stereo/{res_type}/5s'] = measure(
+            lambda: decode_audio(data, target_sr=SAMPLE_RATE, res_type=res_type), repeats)
+        result['saved_vs_librosa_p50_ms'] = baseline['p50_ms'] - result['p50_ms']
+        features = extract_features(decode_audio(data, target_sr=SAMPLE_RATE, res_type=res_type)[0], SAMPLE_RATE)
+        result['mfcc_max_abs_diff'] = float(np.abs(features - reference).max())
+        result['mfcc_max_rel_diff'] = result['mfcc_max_abs_diff'] / float(np.abs(reference).max())
+
+
+def bench_features(results, repeats):
+    for seconds in CLIP_SECONDS:
+        clip = synthetic_clip(seconds)
+        results[f'features/extract_features/{seconds}s'] = measure(
+            lambda: extract_features(clip, SAMPLE_RATE), repeats)
+    clips = [synthetic_clip(5, seed=i) for i in range(32)]
+    results['features/extract_features_batch/32x5s'] = measure(
+        lambda: extract_features_batch(clips, SAMPLE_RATE), max(3, repeats // 4), items=len(clips))
+
+
+def bench_predict(results, repeats, backend_kind, model_path):
+    from inference import load_backend
+    backend = load_backend(backend_kind, model_path)
+    for batch_size in BATCH_SIZES:
+        batch = np.stack([extract_features(synthetic_clip(3, seed=i))[0] for i in range(batch_size)])
+        results[f'predict/{backend.name}/bs={batch_size}'] = measure(
+            lambda: backend.predict(batch), repeats, items=batch_size)
+
+
+def bench_pool(results, repeats, backend_kind, model_path):
+    """
+    Throughput InferencePool per jumlah worker; skala hanya bisa diharapkan
+    sampai jumlah core yang tersedia
+    """
+    from worker_pool import InferencePool
+    clips = [wav_bytes(synthetic_clip(3, seed=i)) for i in range(32)]
+
+    def classify_all(pool):
+        for future in [pool.submit_bytes(data) for data in clips]:
+            future.result(timeout=120)
+
+    for workers in WORKER_COUNTS:
+        pool = InferencePool(backend_kind, model_path, workers=workers)
+        try:
+            pool.start()
+            result = results[f'pool/{backend_kind}/workers={workers}'] = measure(
+                lambda: classify_all(pool), max(3, repeats // 10), warmup=1, items=len(clips))
+            result['worker_private_mb'] = sum(m['private_mb'] for m in pool.memory().values())
+        finally:
+            pool.close()
+
+
+def load_app_with_stub_db():
+    """
+    Import app.py dengan mongomock sebagai pengganti MongoDB, tanpa cache
+    hasil dan tanpa menyimpan audio, sehingga setiap request melewati jalur penuh
+    """
+    import mongomock
+    from database import MongoDB
+    os.environ.setdefault('RESULT_CACHE_SIZE', '0')
+    os.environ.setdefault('PERSIST_AUDIO', '0')
+    import app
+    app.init_services(MongoDB(client=mongomock.MongoClient(), write_mode='sync'))
+    if not app.ready_event.wait(timeout=600):
+        raise RuntimeError(f"App did not become ready: {app.startup_state}")
+    return app
+
+
+def bench_endpoint(results, repeats):
+    app_module = load_app_with_stub_db()
+    client = app_module.app.test_client()
+    for seconds in CLIP_SECONDS:
+        data = wav_bytes(synthetic_clip(seconds))
+
+        def post():
+            response = client.post('/process_audio', data={
+                'audio': (io.BytesIO(data), 'clip.wav'),
+                'user_id': 'bench'
+            }, content_type='multipart/form-data')
+            assert response.status_code == 200, response.get_data(as_text=True)
+
+        results[f'endpoint/process_audio/{seconds}s'] = measure(post, repeats)
+
+    # Format upload: ukuran body dan latensi end-to-end termasuk estimasi upload
+    clip = synthetic_clip(5)
+    for fmt in UPLOAD_FORMATS:
+        data, filename, mime = encode_audio(clip, SAMPLE_RATE, fmt)
+
+        def post_format():
+            response = client.post('/process_audio', data={
+                'audio': (io.BytesIO(data), filename, mime),
+                'user_id': 'bench'
+            }, content_type='multipart/form-data')
+            assert response.status_code == 200, response.get_data(as_text=True)
+
+        result = measure(post_format, repeats)
+        result['bytes'] = len(data)
+        result['upload_ms'] = len(data) * 8 / (UPLINK_MBPS * 1e6) * 1000
+        result['end_to_end_p50_ms'] = result['p50_ms'] + result['upload_ms']
+        results[f'endpoint/upload/{fmt}/5s'] = result
+
+
+def compare(results, baseline, tolerance):
+    """
+    Membandingkan p50 dengan baseline; mengembalikan daftar regresi
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        ratio = current['p50_ms'] / previous['p50_ms'] if previous['p50_ms'] else 1.0
+        status = 'REGRESSION' if ratio > 1 + tolerance else 'ok'
+        print(f"{status:10s} {name:45s} {previous['p50_ms']:9.2f} -> {current['p50_ms']:9.2f} ms ({ratio - 1:+.1%})")
+        if status != 'ok':
+            regressions.append(name)
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark decode, features, predict and /process_audio')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', default=None, help='Previous results file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='Allowed p50 slowdown vs baseline')
+    parser.add_argument('--repeats', type=int, default=30)
+    parser.add_argument('--backend', default='keras', choices=['keras', 'tflite', 'ensemble'])
+    parser.add_argument('--model-path', default=None)
+    parser.add_argument('--only', default='decode,features,predict,endpoint',
+                        help='Comma-separated sections; add "pool" for worker-pool scaling')
+    args = parser.parse_args()
+
+    sections = set(args.only.split(','))
+    results = {}
+    if 'decode' in sections:
+        bench_decode(results, args.repeats)
+    if 'features' in sections:
+        bench_features(results, args.repeats)
+    if 'predict' in sections:
+        bench_predict(results, args.repeats, args.backend, args.model_path)
+    if 'endpoint' in sections:
+        bench_endpoint(results, args.repeats)
+    if 'pool' in sections:
+        bench_pool(results, args.repeats, args.backend, args.model_path)
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'backend': args.backend,
+            'repeats': args.repeats
+        },
+        'results': results
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for name, result in results.items():
+        print(f"{name:45s} p50={result['p50_ms']:9.2f}ms p95={result['p95_ms']:9.2f}ms "
+              f"p99={result['p99_ms']:9.2f}ms {result['throughput_per_sec']:9.1f}/s")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f)['results'], args.tolerance)
+        if regressions:
+            sys.exit(1)
@@ -0,0 +1,68 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResultCache:
+    def __init__(self, max_size=1024, ttl=300.0):
+        """
+        Cache LRU hasil klasifikasi dengan batas ukuran dan TTL (detik)
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(audio_data, model_version):
+        """
+        Kunci cache dari hash buffer audio hasil decode dan versi model
+        """
+        digest = hashlib.blake2b(memoryview(audio_data).cast('B'), digest_size=16).hexdigest()
+        return f'{model_version}:{digest}'
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._entries[key]
+                    self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """
+        Menghapus semua entri, misalnya saat model diganti
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,47 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from audio import encode_audio
+
+DEFAULT_SERVER_URL = 'http://localhost:5000'
+
+
+class EmergencyClient:
+    def __init__(self, base_url=DEFAULT_SERVER_URL, upload_format='flac', timeout=30, pool_size=4):
+        """
+        Klien HTTP untuk server klasifikasi. Satu requests.Session dipakai
+        ulang sehingga koneksi TCP tetap terbuka antar request; audio di-encode
+        (default FLAC) sebelum dikirim agar upload lebih kecil.
+        """
+        self.base_url = base_url.rstrip('/')
+        self.upload_format = upload_format
+        self.timeout = timeout
+        self.session = requests.Session()
+        # Hanya GET yang diulang otomatis; POST tidak idempoten
+        retry = Retry(total=2, backoff_factor=0.3, allowed_methods=['GET'], status_forcelist=[502, 503, 504])
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def classify(self, audio, sr, user_id, mode='clip'):
+        """
+        Mengirim rekaman ke /process_audio; mengembalikan JSON hasil klasifikasi
+        """
+        data, filename, mime = encode_audio(audio, sr, self.upload_format)
+        response = self.session.post(
+            f'{self.base_url}/process_audio',
+            files={'audio': (filename, data, mime)},
+            data={'user_id': user_id, 'mode': mode},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def get(self, path, **params):
+        response = self.session.get(f'{self.base_url}{path}', params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def close(self):
+        self.session.close()
@@ -1,55 +1,356 @@
 from pymongo import MongoClient
+from pymongo.errors import BulkWriteError
+from bson import ObjectId
+from collections import deque
 from datetime import datetime, timedelta
 import logging
+import threading
+import time
+
+DUPLICATE_KEY_ERROR = 11000
+
+# Index compound sesuai filter + sort pada query riwayat dan kasus darurat
+RECORD_INDEXES = [
+    ([('user_id', 1), ('timestamp', -1), ('_id', -1)], 'user_timestamp'),
+    ([('is_urgent', 1), ('timestamp', -1), ('_id', -1)], 'urgent_timestamp'),
+    ([('timestamp', -1)], 'timestamp')
+]
+
+# Field yang dibutuhkan endpoint riwayat/dashboard
+RECORD_PROJECTION = {
+    'user_id': 1,
+    'timestamp': 1,
+    'is_urgent': 1,
+    'confidence': 1,
+    'audio_path': 1,
+    'model_version': 1
+}
+
+
+# Rollup statistik per bucket waktu: resolusi -> lama bucket (detik)
+ROLLUP_RESOLUTIONS = {'minute': 60, 'hour': 3600}
+# Bucket per menit hanya dibutuhkan untuk tepi jendela statistik
+MINUTE_ROLLUP_TTL_SECONDS = 7 * 24 * 3600
+
+
+def bucket_start(timestamp, seconds):
+    return timestamp.replace(microsecond=0) - timedelta(
+        seconds=(timestamp.minute * 60 + timestamp.second) % seconds)
+
+
+def rollup_increments(records):
+    """
+    Increment per (resolusi, awal bucket) untuk sekumpulan record; record
+    pada bucket yang sama digabung sehingga satu flush = satu update per bucket
+    """
+    increments = {}
+    for record in records:
+        confidence = record.get('confidence')
+        for resolution, seconds in ROLLUP_RESOLUTIONS.items():
+            key = (resolution, bucket_start(record['timestamp'], seconds))
+            inc = increments.setdefault(key, {'total': 0, 'urgent': 0, 'confidence_sum': 0.0, 'confidence_count': 0})
+            inc['total'] += 1
+            inc['urgent'] += 1 if record.get('is_urgent') else 0
+            if confidence is not None:
+                inc['confidence_sum'] += float(confidence)
+                inc['confidence_count'] += 1
+    return increments
+
+
+def statistics_summary(totals, hours):
+    """
+    Bentuk respons statistik dari jumlah total/urgent/confidence
+    """
+    count = totals['confidence_count']
+    return {
+        'total_detections': totals['total'],
+        'urgent_cases': totals['urgent'],
+        'normal_cases': totals['total'] - totals['urgent'],
+        'mean_confidence': totals['confidence_sum'] / count if count else None,
+        'time_window_hours': hours
+    }
+
+
+class WriteBehindBuffer:
+    def __init__(self, collection, max_batch=100, flush_interval=1.0, max_pending=10000,
+                 retry_backoff=0.5, max_backoff=30.0, on_written=None, logger=None):
+        """
+        Buffer write-behind: record diantrikan lalu ditulis dengan insert_many
+        saat jumlahnya mencapai max_batch atau setiap flush_interval detik.
+        Antrian dibatasi max_pending; jika penuh, record tertua dibuang.
+        on_written(records) dipanggil dengan record yang baru saja tertulis.
+        """
+        self.collection = collection
+        self.on_written = on_written
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self.logger = logger or logging.getLogger(__name__)
+
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self._failures = 0
+        self.stats = {'written': 0, 'flushes': 0, 'failed_flushes': 0, 'dropped': 0}
+
+        self._thread = threading.Thread(target=self._run, name='db-write-behind', daemon=True)
+        self._thread.start()
+
+    def add(self, record):
+        """
+        Mengantrikan record; _id dibuat di sisi klien agar bisa langsung dikembalikan
+        """
+        if '_id' not in record:
+            record['_id'] = ObjectId()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('Write-behind buffer is closed')
+            if len(self._pending) >= self.max_pending:
+                dropped = self._pending.popleft()
+                self.stats['dropped'] += 1
+                self.logger.error(f"Write-behind buffer full, dropping record {dropped['_id']}")
+            self._pending.append(record)
+            if len(self._pending) >= self.max_batch:
+                self._cond.notify()
+        return record['_id']
+
+    def pending(self):
+        with self._cond:
+            return len(self._pending)
+
+    def _take_batch(self):
+        with self._cond:
+            batch = []
+            while self._pending and len(batch) < self.max_batch:
+                batch.append(self._pending.popleft())
+            return batch
+
+    def _requeue(self, records):
+        with self._cond:
+            for record in reversed(records):
+                if len(self._pending) >= self.max_pending:
+                    self.stats['dropped'] += 1
+                    self.logger.error(f"Write-behind buffer full, dropping record {record['_id']}")
+                    continue
+                self._pending.appendleft(record)
+
+    def flush(self):
+        """
+        Menulis semua record yang tertunda; mengembalikan False jika ada batch gagal
+        """
+        with self._flush_lock:
+            while True:
+                batch = self._take_batch()
+                if not batch:
+                    return True
+                if not self._write(batch):
+                    return False
+
+    def _write(self, batch):
+        try:
+            self.collection.insert_many(batch, ordered=False)
+            written = len(batch)
+            failed = []
+            inserted = batch
+        except BulkWriteError as e:
+            # Record yang _id-nya sudah ada berarti tertulis pada percobaan sebelumnya
+            errors = {err['index']: err.get('code') for err in e.details.get('writeErrors', [])}
+            failed = [record for i, record in enumerate(batch) if errors.get(i, DUPLICATE_KEY_ERROR) != DUPLICATE_KEY_ERROR]
+            inserted = [record for i, record in enumerate(batch) if i not in errors]
+            written = len(batch) - len(failed)
+        except Exception as e:
+            self.logger.error(f"Error flushing {len(batch)} records: {str(e)}")
+            failed = batch
+            inserted = []
+            written = 0
+
+        if inserted and self.on_written is not None:
+            self.on_written(inserted)
+
+        self.stats['written'] += written
+        self.stats['flushes'] += 1
+        if failed:
+            self.stats['failed_flushes'] += 1
+            self._failures += 1
+            self._requeue(failed)
+            return False
+        self._failures = 0
+        return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._failures:
+                    # Setelah gagal, tunggu dengan backoff eksponensial
+                    backoff = min(self.retry_backoff * 2 ** (self._failures - 1), self.max_backoff)
+                    deadline = time.monotonic() + backoff
+                    while not self._closed and time.monotonic() < deadline:
+                        self._cond.wait(timeout=deadline - time.monotonic())
+                elif not self._closed and len(self._pending) < self.max_batch:
+                    self._cond.wait(timeout=self.flush_interval)
+                if self._closed:
+                    return
+            self.flush()
+
+    def close(self, timeout=10.0):
+        """
+        Menghentikan thread dan menulis sisa record (dipanggil saat shutdown)
+        """
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout=timeout)
+        if not self.flush():
+            self.logger.error(f"Write-behind buffer closed with {self.pending()} unwritten records")
+
 
 class MongoDB:
-    def __init__(self, db_name='emergency_db', collection_name='audio_records', logger=None):
+    def __init__(self, db_name='emergency_db', collection_name='audio_records', logger=None,
+                 client=None, write_mode='sync', ensure_indexes=True, **buffer_options):
         """
-        Inisialisasi koneksi MongoDB
+        Inisialisasi koneksi MongoDB.
+        write_mode='write_behind' mengaktifkan penulisan batch di background,
+        'sync' menulis langsung dengan insert_one.
         """
-        self.client = MongoClient('mongodb://localhost:27017/')
+        self.client = client or MongoClient('mongodb://localhost:27017/')
         self.db = self.client[db_name]
         self.records = self.db[collection_name]
+        # Rollup per menit dan per jam, diperbarui dengan $inc setiap kali record tersimpan
+        self.rollups = {
+            resolution: self.db[f'{collection_name}_rollup_{resolution}']
+            for resolution in ROLLUP_RESOLUTIONS
+        }
         self.logger = logger or logging.getLogger(__name__)
+        self.writer = None
+        if write_mode == 'write_behind':
+            self.writer = WriteBehindBuffer(self.records, on_written=self.update_rollups,
+                                            logger=self.logger, **buffer_options)
+        elif write_mode != 'sync':
+            raise ValueError(f"Unknown write mode: {write_mode}")
+        if ensure_indexes:
+            self.ensure_indexes()
+
+    def ensure_indexes(self):
+        """
+        Membuat index compound untuk query riwayat, kasus darurat dan statistik
+        """
+        try:
+            for keys, name in RECORD_INDEXES:
+                self.records.create_index(keys, name=name)
+            self.rollups['minute'].create_index(
+                'bucket', name='bucket_ttl', expireAfterSeconds=MINUTE_ROLLUP_TTL_SECONDS)
+            self.logger.info("MongoDB indexes ensured")
+        except Exception as e:
+            self.logger.error(f"Error ensuring indexes: {str(e)}")
 
     def save_record(self, record):
         """
         Menyimpan record ke database
         """
+        if self.writer is not None:
+            return self.writer.add(record)
         try:
             result = self.records.insert_one(record)
             self.logger.info(f"Record saved with ID: {result.inserted_id}")
+            self.update_rollups([record])
             return result.inserted_id
         except Exception as e:
             self.logger.error(f"Error saving record: {str(e)}", exc_info=True)
             raise
 
-    def get_user_history(self, user_id, limit=100):
+    def update_rollups(self, records):
+        """
+        Menambahkan record ke bucket rollup dengan upsert $inc. Rollup adalah
+        data turunan, jadi kegagalan hanya dicatat tanpa menggagalkan penyimpanan.
+        """
+        try:
+            for (resolution, bucket), inc in rollup_increments(records).items():
+                self.rollups[resolution].update_one(
+                    {'_id': bucket},
+                    {'$inc': inc, '$setOnInsert': {'bucket': bucket}},
+                    upsert=True
+                )
+        except Exception as e:
+            self.logger.error(f"Error updating rollups: {str(e)}")
+
+    def rebuild_rollups(self, since=None):
+        """
+        Menghitung ulang rollup dari audio_records (misalnya untuk data lama)
+        """
+        query = {'timestamp': {'$gte': since}} if since is not None else {}
+        totals = rollup_increments(self.records.find(query, {'timestamp': 1, 'is_urgent': 1, 'confidence': 1}))
+        for (resolution, bucket), values in totals.items():
+            self.rollups[resolution].replace_one({'_id': bucket}, dict(values, bucket=bucket), upsert=True)
+        return len(totals)
+
+    def rollup_buckets(self, resolution, start, end=None):
+        """
+        Dokumen bucket `resolution` dengan awal bucket di [start, end)
+        """
+        query = {'$gte': start}
+        if end is not None:
+            query['$lt'] = end
+        return self.rollups[resolution].find({'_id': query}).sort('_id', 1)
+
+    def _keyset(self, query, before):
+        """
+        Menambahkan filter keyset (timestamp, _id) untuk halaman berikutnya
+        """
+        if before is not None:
+            timestamp, record_id = before
+            query['$or'] = [
+                {'timestamp': {'$lt': timestamp}},
+                {'timestamp': timestamp, '_id': {'$lt': record_id}}
+            ]
+        return query
+
+    def iter_user_history(self, user_id, limit=100, before=None):
+        """
+        Cursor riwayat pengguna, urut terbaru, mulai setelah keyset `before`
+        """
+        query = self._keyset({'user_id': user_id}, before)
+        return (
+            self.records.find(query, RECORD_PROJECTION)
+            .sort([('timestamp', -1), ('_id', -1)])
+            .limit(limit)
+        )
+
+    def iter_urgent(self, hours=24, limit=100, before=None):
+        """
+        Cursor kasus darurat dalam `hours` jam terakhir, mulai setelah keyset `before`
+        """
+        time_threshold = datetime.now() - timedelta(hours=hours)
+        query = self._keyset({
+            'is_urgent': True,
+            'timestamp': {'$gte': time_threshold}
+        }, before)
+        return (
+            self.records.find(query, RECORD_PROJECTION)
+            .sort([('timestamp', -1), ('_id', -1)])
+            .limit(limit)
+        )
+
+    def get_user_history(self, user_id, limit=100, before=None):
         """
         Mendapatkan riwayat pengguna dengan pagination
         """
         try:
-            return list(
-                self.records.find({'user_id': user_id})
-                .sort('timestamp', -1)
-                .limit(limit)
-            )
+            return list(self.iter_user_history(user_id, limit, before))
         except Exception as e:
             self.logger.error(f"Error getting user history: {str(e)}")
             return []
 
-    def get_all_urgent(self, hours=24):
+    def get_all_urgent(self, hours=24, limit=0, before=None):
         """
         Mendapatkan semua kasus darurat dalam 24 jam terakhir
         """
         try:
-            time_threshold = datetime.now() - timedelta(hours=hours)
-            return list(
-                self.records.find({
-                    'is_urgent': True,
-                    'timestamp': {'$gte': time_threshold}
-                }).sort('timestamp', -1)
-            )
+            return list(self.iter_urgent(hours, limit, before))
         except Exception as e:
             self.logger.error(f"Error getting urgent cases: {str(e)}")
             return []
@@ -61,7 +362,7 @@ class MongoDB:
         try:
             time_threshold = datetime.now() - timedelta(hours=hours)
             return list(
-                self.records.find({'timestamp': {'$gte': time_threshold}})
+                self.records.find({'timestamp': {'$gte': time_threshold}}, RECORD_PROJECTION)
                 .sort('timestamp', -1)
                 .limit(limit)
             )
@@ -71,37 +372,39 @@ class MongoDB:
 
     def get_statistics(self, hours=24):
         """
-        Mendapatkan statistik deteksi
+        Mendapatkan statistik deteksi dari rollup: bucket per jam untuk jam
+        penuh dan bucket per menit untuk tepi awal jendela, sehingga jumlah
+        dokumen yang dibaca tidak bergantung pada ukuran audio_records.
+        Bucket per menit kedaluwarsa setelah MINUTE_ROLLUP_TTL_SECONDS; untuk
+        jendela yang lebih panjang tepi awal dibaca dari bucket jam yang
+        memuatnya, sehingga bisa ikut menghitung hingga <1 jam sebelum awal
+        jendela (lebih baik daripada kehilangan tepi itu sama sekali).
         """
+        totals = {'total': 0, 'urgent': 0, 'confidence_sum': 0.0, 'confidence_count': 0}
         try:
-            time_threshold = datetime.now() - timedelta(hours=hours)
-            total = self.records.count_documents({
-                'timestamp': {'$gte': time_threshold}
-            })
-            urgent = self.records.count_documents({
-                'is_urgent': True,
-                'timestamp': {'$gte': time_threshold}
-            })
-            return {
-                'total_detections': total,
-                'urgent_cases': urgent,
-                'normal_cases': total - urgent,
-                'time_window_hours': hours
-            }
+            now = datetime.now()
+            start = bucket_start(now - timedelta(hours=hours), ROLLUP_RESOLUTIONS['minute'])
+            first_full_hour = bucket_start(start, ROLLUP_RESOLUTIONS['hour'])
+            # Sisakan margin satu jam agar bucket yang hampir dihapus TTL tidak dipakai
+            minute_horizon = now - timedelta(seconds=MINUTE_ROLLUP_TTL_SECONDS - ROLLUP_RESOLUTIONS['hour'])
+            if first_full_hour < start and start >= minute_horizon:
+                first_full_hour += timedelta(seconds=ROLLUP_RESOLUTIONS['hour'])
+            buckets = list(self.rollup_buckets('minute', start, first_full_hour))
+            buckets += list(self.rollup_buckets('hour', first_full_hour))
+            for bucket in buckets:
+                for field in totals:
+                    totals[field] += bucket.get(field, 0)
         except Exception as e:
             self.logger.error(f"Error getting statistics: {str(e)}")
-            return {
-                'total_detections': 0,
-                'urgent_cases': 0,
-                'normal_cases': 0,
-                'time_window_hours': hours
-            }
+        return statistics_summary(totals, hours)
 
     def close_connection(self):
         """
         Menutup koneksi database
         """
         try:
+            if self.writer is not None:
+                self.writer.close()
             self.client.close()
             self.logger.info("MongoDB connection closed")
         except Exception as e:
@@ -0,0 +1,158 @@
+import os
+import csv
+import time
+import logging
+import argparse
+import threading
+
+import numpy as np
+from bson import ObjectId
+
+from features import MAX_LENGTH, N_MFCC
+from inference import interpret_prediction, load_backend
+
+logger = logging.getLogger(__name__)
+
+ID_BYTES = 12
+
+
+class FeatureStore:
+    def __init__(self, directory, mode='a', row_shape=(MAX_LENGTH, N_MFCC), grow_rows=4096):
+        """
+        Penyimpanan fitur MFCC append-only: satu file float32 yang di-memory-map
+        (features.f32) dan file ObjectId record (ids.bin) dengan urutan baris
+        yang sama. Baris ditulis lebih dulu, id sesudahnya, sehingga jumlah id
+        menjadi titik commit dan baris yang terpotong saat crash diabaikan.
+        mode 'a' untuk menambah data, 'r' hanya baca.
+        """
+        self.directory = directory
+        self.mode = mode
+        self.row_shape = tuple(row_shape)
+        self.grow_rows = grow_rows
+        self._row_bytes = int(np.prod(self.row_shape)) * 4
+        self._lock = threading.Lock()
+        self._features_path = os.path.join(directory, 'features.f32')
+        self._ids_path = os.path.join(directory, 'ids.bin')
+
+        if mode == 'a':
+            os.makedirs(directory, exist_ok=True)
+            for path in (self._features_path, self._ids_path):
+                open(path, 'ab').close()
+        with open(self._ids_path, 'rb') as f:
+            raw_ids = f.read()
+        self.count = len(raw_ids) // ID_BYTES
+        self._ids = [raw_ids[i:i + ID_BYTES] for i in range(0, self.count * ID_BYTES, ID_BYTES)]
+        self._rows = {record_id: row for row, record_id in enumerate(self._ids)}
+
+        self._ids_file = None
+        if mode == 'a':
+            # Buang id terakhir yang hanya tertulis sebagian
+            with open(self._ids_path, 'rb+') as f:
+                f.truncate(self.count * ID_BYTES)
+            self._ids_file = open(self._ids_path, 'ab')
+        self._map(max(self.count, os.path.getsize(self._features_path) // self._row_bytes))
+
+    def _map(self, capacity):
+        if self.mode == 'a' and capacity * self._row_bytes > os.path.getsize(self._features_path):
+            with open(self._features_path, 'rb+') as f:
+                f.truncate(capacity * self._row_bytes)
+        self.capacity = capacity
+        if capacity == 0:
+            self._data = np.empty((0,) + self.row_shape, dtype=np.float32)
+            return
+        # View lama tetap valid setelah file diperbesar dan dipetakan ulang
+        self._data = np.memmap(self._features_path, dtype=np.float32,
+                               mode='r+' if self.mode == 'a' else 'r',
+                               shape=(capacity,) + self.row_shape)
+
+    def append(self, record_id, features):
+        """
+        Menambahkan satu tensor fitur (94, 13) untuk record `record_id`;
+        mengembalikan nomor baris
+        """
+        features = np.asarray(features, dtype=np.float32).reshape(self.row_shape)
+        record_id = ObjectId(record_id).binary
+        with self._lock:
+            row = self.count
+            if row >= self.capacity:
+                self._map(self.capacity + max(self.grow_rows, self.capacity // 2))
+            self._data[row] = features
+            self._ids_file.write(record_id)
+            self._ids_file.flush()
+            self._ids.append(record_id)
+            self._rows[record_id] = row
+            self.count = row + 1
+        return row
+
+    def read(self, start=0, stop=None):
+        """
+        View (tanpa salinan) ke baris [start, stop) langsung dari memory map,
+        siap dipakai sebagai batch predict
+        """
+        stop = self.count if stop is None else min(stop, self.count)
+        return self._data[start:stop]
+
+    def ids(self, start=0, stop=None):
+        stop = self.count if stop is None else min(stop, self.count)
+        return [ObjectId(record_id) for record_id in self._ids[start:stop]]
+
+    def get(self, record_id):
+        """
+        Fitur satu record, atau None jika tidak ada di store
+        """
+        row = self._rows.get(ObjectId(record_id).binary)
+        return None if row is None else self._data[row]
+
+    def iter_batches(self, batch_size=1024):
+        """
+        (ids, fitur) per batch; fitur berupa view ke memory map
+        """
+        for start in range(0, self.count, batch_size):
+            yield self.ids(start, start + batch_size), self.read(start, start + batch_size)
+
+    def flush(self):
+        if self.mode == 'a' and isinstance(self._data, np.memmap):
+            self._data.flush()
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            if self._ids_file is not None:
+                self._ids_file.close()
+                self._ids_file = None
+
+
+def rescore(store, predict, batch_size=1024):
+    """
+    Menilai ulang seluruh fitur di store dengan fungsi predict (batch -> prediksi).
+    Menghasilkan (record_id, is_urgent, confidence) per record.
+    """
+    for ids, batch in store.iter_batches(batch_size):
+        for record_id, prediction in zip(ids, predict(batch)):
+            is_urgent, confidence = interpret_prediction(prediction)
+            yield record_id, is_urgent, confidence
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Re-score stored MFCC features with a model from models/')
+    parser.add_argument('store', help='Feature store directory (FEATURE_STORE_DIR)')
+    parser.add_argument('output', help='CSV file with record_id, is_urgent, confidence, model_version')
+    parser.add_argument('--backend', default='keras', choices=['keras', 'tflite', 'ensemble'])
+    parser.add_argument('--model-path', default=None)
+    parser.add_argument('--batch-size', type=int, default=1024)
+    args = parser.parse_args()
+
+    store = FeatureStore(args.store, mode='r')
+    backend = load_backend(args.backend, args.model_path)
+    model_version = f"{backend.name}:{os.path.basename(backend.model_path)}"
+    logger.info(f"Re-scoring {store.count} records with {model_version}")
+
+    started = time.monotonic()
+    with open(args.output, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['record_id', 'is_urgent', 'confidence', 'model_version'])
+        for record_id, is_urgent, confidence in rescore(store, backend.predict, args.batch_size):
+            writer.writerow([str(record_id), is_urgent, confidence, model_version])
+    elapsed = time.monotonic() - started
+    logger.info(f"Re-scored {store.count} records in {elapsed:.1f}s ({store.count / max(elapsed, 1e-9):.0f} records/s)")
@@ -0,0 +1,214 @@
+import threading
+
+import numpy as np
+import scipy.fft
+
+# Parameter MFCC harus sama dengan saat training
+SAMPLE_RATE = 16000
+N_MFCC = 13
+N_FFT = 2048
+HOP_LENGTH = 512
+N_MELS = 128
+MAX_LENGTH = 94
+TOP_DB = 80.0
+AMIN = 1e-10
+# Batas pengelompokan clip pada extract_features_batch: panjang terpanjang
+# dalam satu kelompok maksimal GROUP_MAX_RATIO x terpendek, dan total sampel
+# setelah padding maksimal GROUP_MAX_SAMPLES (~4 menit audio 16 kHz)
+GROUP_MAX_RATIO = 1.25
+GROUP_MAX_SAMPLES = 1 << 22
+
+_basis_cache = {}
+_basis_lock = threading.Lock()
+
+
+def get_basis(sr=SAMPLE_RATE, n_fft=N_FFT, hop_length=HOP_LENGTH, n_mfcc=N_MFCC):
+    """
+    Window STFT, mel filterbank dan matriks DCT, dibuat sekali per
+    kombinasi (sr, n_fft, hop_length, n_mfcc) lalu di-cache
+    """
+    key = (sr, n_fft, hop_length, n_mfcc)
+    basis = _basis_cache.get(key)
+    if basis is None:
+        with _basis_lock:
+            basis = _basis_cache.get(key)
+            if basis is None:
+                # librosa hanya dibutuhkan untuk membangun basis, diimpor saat pertama dipakai
+                import librosa
+                window = librosa.filters.get_window('hann', n_fft, fftbins=True).astype(np.float32)
+                mel = librosa.filters.mel(sr=sr, n_fft=n_fft, n_mels=N_MELS).astype(np.float32)
+                dct = scipy.fft.dct(np.eye(N_MELS), type=2, norm='ortho', axis=0)[:n_mfcc]
+                basis = {
+                    'window': window,
+                    'mel_t': np.ascontiguousarray(mel.T),
+                    'dct_t': np.ascontiguousarray(dct.T.astype(np.float32)),
+                    'n_fft': n_fft,
+                    'hop_length': hop_length
+                }
+                _basis_cache[key] = basis
+    return basis
+
+
+def num_frames(n_samples, hop_length=HOP_LENGTH):
+    # Jumlah frame STFT dengan center=True
+    return 1 + n_samples // hop_length
+
+
+def log_mel_frames(padded, n_frames, basis, frame_budget=512):
+    """
+    Log-mel (dB, sebelum clipping top_db) untuk array audio yang sudah
+    di-pad, bentuk (N, samples) -> (N, n_frames, n_mels). STFT dihitung per
+    potongan berisi sekitar frame_budget frame (dari semua clip) agar memori
+    tetap terbatas untuk audio panjang maupun batch besar.
+    """
+    n_fft = basis['n_fft']
+    hop = basis['hop_length']
+    n_rows = int(np.prod(padded.shape[:-1]))
+    chunk_frames = max(1, frame_budget // max(1, n_rows))
+    frames = np.lib.stride_tricks.sliding_window_view(padded, n_fft, axis=-1)[..., ::hop, :]
+    out = np.empty(padded.shape[:-1] + (n_frames, basis['mel_t'].shape[1]), dtype=np.float32)
+    for start in range(0, n_frames, chunk_frames):
+        stop = min(start + chunk_frames, n_frames)
+        spectrum = scipy.fft.rfft(frames[..., start:stop, :] * basis['window'], axis=-1)
+        power = spectrum.real ** 2 + spectrum.imag ** 2
+        mel = power @ basis['mel_t']
+        np.log10(np.maximum(mel, AMIN), out=out[..., start:stop, :])
+    out *= 10.0
+    return out
+
+
+def length_groups(lengths, max_ratio=GROUP_MAX_RATIO, max_samples=GROUP_MAX_SAMPLES):
+    """
+    Indeks clip dikelompokkan menurut panjang agar padding ke clip terpanjang
+    tidak memboroskan memori: dalam satu kelompok panjang maksimal
+    max_ratio x panjang terpendek dan total sampel setelah padding maksimal
+    max_samples. Clip yang lebih panjang dari max_samples diproses sendiri.
+    """
+    groups = []
+    current = []
+    for i in np.argsort(lengths, kind='stable').tolist():
+        if current and (lengths[i] > max_ratio * max(lengths[current[0]], 1)
+                        or lengths[i] * (len(current) + 1) > max_samples):
+            groups.append(current)
+            current = []
+        current.append(i)
+    if current:
+        groups.append(current)
+    return groups
+
+
+def extract_features_batch(clips, sr=SAMPLE_RATE, max_length=MAX_LENGTH, pad_mode='constant'):
+    """
+    Ekstraksi MFCC untuk N clip dalam pass NumPy per kelompok panjang
+    (lihat length_groups). Hasil berbentuk (N, max_length, n_mfcc) dan
+    identik dengan normalisasi serta padding per clip pada extract_features.
+    """
+    lengths = [len(clip) for clip in clips]
+    groups = length_groups(lengths)
+    if len(groups) == 1:
+        return _extract_group(clips, sr, max_length, pad_mode)
+    features = np.empty((len(clips), max_length, N_MFCC), dtype=np.float32)
+    for group in groups:
+        features[group] = _extract_group([clips[i] for i in group], sr, max_length, pad_mode)
+    return features
+
+
+def _extract_group(clips, sr, max_length, pad_mode):
+    basis = get_basis(sr)
+    n_fft = basis['n_fft']
+    lengths = np.array([len(clip) for clip in clips])
+    frame_counts = num_frames(lengths, basis['hop_length'])
+    n_frames = int(frame_counts.max())
+
+    # Semua clip di-pad (center=True) ke panjang yang sama
+    padded = np.zeros((len(clips), lengths.max() + n_fft), dtype=np.float32)
+    for i, clip in enumerate(clips):
+        padded[i, :len(clip) + n_fft] = np.pad(clip, n_fft // 2, mode=pad_mode)
+
+    log_mel = log_mel_frames(padded, n_frames, basis)
+    valid = np.arange(n_frames)[None, :] < frame_counts[:, None]
+
+    # Clipping top_db relatif terhadap nilai maksimum tiap clip
+    peak = np.where(valid[..., None], log_mel, -np.inf).max(axis=(1, 2))
+    np.maximum(log_mel, (peak - TOP_DB)[:, None, None], out=log_mel)
+
+    mfcc = log_mel @ basis['dct_t']
+
+    # Normalisasi per clip seperti saat training
+    mask = valid[..., None]
+    count = frame_counts[:, None, None] * mfcc.shape[-1]
+    mean = np.where(mask, mfcc, 0).sum(axis=(1, 2), keepdims=True) / count
+    var = np.where(mask, (mfcc - mean) ** 2, 0).sum(axis=(1, 2), keepdims=True) / count
+    mfcc = (mfcc - mean) / np.sqrt(var)
+
+    # Padding/truncate ke max_length frame
+    features = np.zeros((len(clips), max_length, mfcc.shape[-1]), dtype=np.float32)
+    keep = min(max_length, n_frames)
+    features[:, :keep] = np.where(mask[:, :keep], mfcc[:, :keep], 0)
+    return features
+
+
+def features_from_log_mel(log_mel, basis, max_length=MAX_LENGTH):
+    """
+    MFCC ternormalisasi (max_length, n_mfcc) dari log-mel satu clip/jendela
+    berbentuk (frames, n_mels), dengan aturan yang sama seperti extract_features
+    """
+    log_mel = np.maximum(log_mel, log_mel.max() - TOP_DB)
+    mfcc = log_mel @ basis['dct_t']
+    mfcc = (mfcc - np.mean(mfcc)) / np.std(mfcc)
+    features = np.zeros((max_length, mfcc.shape[-1]), dtype=np.float32)
+    keep = min(max_length, len(mfcc))
+    features[:keep] = mfcc[:keep]
+    return features
+
+
+# Tambahkan normalisasi MFCC seperti saat training
+def extract_features(audio_data, sr=SAMPLE_RATE):
+    return extract_features_batch([audio_data], sr)
+
+
+def window_starts(n_frames, window_frames=MAX_LENGTH, hop_frames=MAX_LENGTH // 2):
+    """
+    Frame awal setiap jendela; jendela terakhir digeser agar ekor rekaman ikut dinilai
+    """
+    if n_frames <= window_frames:
+        return np.zeros(1, dtype=np.int64)
+    starts = np.arange(0, n_frames - window_frames + 1, hop_frames)
+    if starts[-1] != n_frames - window_frames:
+        starts = np.append(starts, n_frames - window_frames)
+    return starts
+
+
+def extract_window_features(audio_data, sr=SAMPLE_RATE, window_frames=MAX_LENGTH,
+                            hop_frames=MAX_LENGTH // 2, chunk_windows=64):
+    """
+    Fitur untuk rekaman panjang: log-mel dihitung sekali untuk seluruh
+    rekaman, lalu dibagi menjadi jendela window_frames yang saling tumpang
+    tindih (view strided, tanpa salinan). Setiap jendela dinormalisasi seperti
+    satu clip pada features_from_log_mel. Diproses per chunk_windows jendela
+    sehingga memori kerja tetap terbatas dan waktu linear terhadap durasi.
+    Mengembalikan (features (n_windows, window_frames, n_mfcc), frame awal).
+    """
+    basis = get_basis(sr)
+    n_frames = num_frames(len(audio_data), basis['hop_length'])
+    if n_frames <= window_frames:
+        return extract_features_batch([audio_data], sr, window_frames), window_starts(n_frames, window_frames)
+
+    padded = np.pad(audio_data.astype(np.float32, copy=False), basis['n_fft'] // 2)
+    log_mel = log_mel_frames(padded, n_frames, basis)
+    starts = window_starts(n_frames, window_frames, hop_frames)
+
+    # (n_frames - W + 1, W, n_mels) sebagai view; top_db relatif terhadap puncak tiap jendela
+    windows = np.lib.stride_tricks.sliding_window_view(log_mel, window_frames, axis=0).swapaxes(1, 2)
+    frame_peak = log_mel.max(axis=1)
+    window_peak = np.lib.stride_tricks.sliding_window_view(frame_peak, window_frames)[starts].max(axis=1)
+
+    features = np.empty((len(starts), window_frames, basis['dct_t'].shape[1]), dtype=np.float32)
+    for i in range(0, len(starts), chunk_windows):
+        chunk = slice(i, i + chunk_windows)
+        clipped = np.maximum(windows[starts[chunk]], (window_peak[chunk] - TOP_DB)[:, None, None])
+        mfcc = clipped @ basis['dct_t']
+        mean = mfcc.mean(axis=(1, 2), keepdims=True)
+        std = mfcc.std(axis=(1, 2), keepdims=True)
+        features[chunk] = (mfcc - mean) / std
+    return features, starts
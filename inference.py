@@ -0,0 +1,474 @@
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+# Indeks kelas yang dipakai sebagai confidence, sama dengan process_audio
+URGENT_INDEX = 0
+URGENT_THRESHOLD = 0.5
+
+DEFAULT_MODEL_PATHS = {
+    'keras': 'models/final_model.h5',
+    'tflite': 'models/lstm_model_fold_4.tflite',
+    'ensemble': 'models'
+}
+
+FOLD_MODEL_PATTERN = re.compile(r'^lstm_model_fold_(\d+)\.h5$')
+
+
+def interpret_prediction(prediction):
+    """
+    Mengubah satu baris output model menjadi (is_urgent, confidence).
+    Untuk ensemble (baris berbentuk (n_folds, n_classes)) dipakai rata-rata fold.
+    """
+    if prediction.ndim == 2:
+        confidence = float(np.mean(prediction[:, URGENT_INDEX]))
+    else:
+        confidence = float(prediction[URGENT_INDEX])
+    return confidence > URGENT_THRESHOLD, confidence
+
+
+def interpret_windows(predictions):
+    """
+    Keputusan agregat untuk jendela-jendela satu rekaman panjang: darurat jika
+    ada jendela yang melewati ambang, confidence = jendela tertinggi.
+    Mengembalikan (is_urgent, confidence, confidence per jendela).
+    """
+    confidences = predictions[..., URGENT_INDEX]
+    if confidences.ndim == 2:
+        confidences = confidences.mean(axis=1)
+    confidence = float(confidences.max())
+    return confidence > URGENT_THRESHOLD, confidence, confidences
+
+
+def prediction_spread(prediction):
+    """
+    Sebaran confidence antar fold untuk output ensemble, None untuk model tunggal
+    """
+    if prediction.ndim != 2:
+        return None
+    scores = prediction[:, URGENT_INDEX]
+    return {
+        'fold_std': float(np.std(scores)),
+        'fold_min': float(np.min(scores)),
+        'fold_max': float(np.max(scores))
+    }
+
+
+class KerasBackend:
+    name = 'keras'
+
+    def __init__(self, model_path):
+        """
+        Backend inferensi menggunakan model Keras (.h5)
+        """
+        import tensorflow as tf
+        self.model_path = model_path
+        self.model = tf.keras.models.load_model(model_path, compile=False)
+
+    def predict(self, batch):
+        # predict_on_batch memakai fungsi predict yang sudah di-trace tanpa
+        # overhead pipeline data model.predict untuk setiap panggilan
+        return self.model.predict_on_batch(batch)
+
+
+def tflite_interpreter_class():
+    """
+    Interpreter TFLite dari runtime ringan (ai-edge-litert / tflite-runtime)
+    jika terpasang, sehingga proses worker tidak perlu mengimpor TensorFlow penuh
+    """
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    try:
+        from tflite_runtime.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        import tensorflow as tf
+        return tf.lite.Interpreter
+
+
+class TFLiteBackend:
+    name = 'tflite'
+
+    def __init__(self, model_path, num_threads=1, pool_size=None):
+        """
+        Backend inferensi TFLite dengan pool interpreter berukuran tetap
+        (default jumlah core). Setiap predict meminjam satu interpreter dan
+        mengembalikannya setelah selesai, sehingga jumlah interpreter (dan
+        memori) tidak bertambah mengikuti jumlah thread request.
+        Tensor input/output dialokasikan sekali saat interpreter dibuat.
+        Model full-int8 diterima apa adanya: input dikuantisasi dan output
+        didekuantisasi memakai parameter kuantisasi tensor-nya.
+        """
+        self._interpreter_cls = tflite_interpreter_class()
+        self.model_path = model_path
+        self.num_threads = num_threads
+        self.pool_size = max(1, pool_size or os.cpu_count() or 1)
+        self._pool = queue.Queue()
+        for _ in range(self.pool_size):
+            self._pool.put(self._create_state())
+        # Metadata model dari salah satu interpreter sekaligus validasi model
+        state = self._pool.queue[0]
+        self.input_shape = tuple(state['input_shape'])
+        self.output_size = state['output_size']
+        self.input_dtype = state['input_dtype']
+
+    def _create_state(self):
+        interpreter = self._interpreter_cls(
+            model_path=self.model_path,
+            num_threads=self.num_threads
+        )
+        interpreter.allocate_tensors()
+        input_details = interpreter.get_input_details()[0]
+        output_details = interpreter.get_output_details()[0]
+        return {
+            'interpreter': interpreter,
+            'input_index': input_details['index'],
+            'output_index': output_details['index'],
+            'input_shape': input_details['shape'],
+            'output_size': int(output_details['shape'][-1]),
+            'input_dtype': input_details['dtype'],
+            # (scale, zero_point); scale 0 berarti tensor float
+            'input_quant': input_details['quantization'],
+            'output_quant': output_details['quantization']
+        }
+
+    def available(self):
+        """
+        Jumlah interpreter yang sedang tidak dipakai
+        """
+        return self._pool.qsize()
+
+    def predict(self, batch, out=None):
+        """
+        Menjalankan interpreter pinjaman untuk setiap sampel pada buffer
+        tensor yang sudah dialokasikan; hasil ditulis ke `out` jika diberikan.
+        Jika semua interpreter sedang dipakai, pemanggil menunggu.
+        """
+        state = self._pool.get()
+        try:
+            return self._run(state, batch, out)
+        finally:
+            self._pool.put(state)
+
+    def _run(self, state, batch, out):
+        interpreter = state['interpreter']
+        input_index = state['input_index']
+        output_index = state['output_index']
+        if out is None:
+            out = np.empty((len(batch), state['output_size']), dtype=np.float32)
+        in_scale, in_zero = state['input_quant']
+        out_scale, out_zero = state['output_quant']
+        if in_scale:
+            info = np.iinfo(state['input_dtype'])
+            batch = np.clip(np.round(batch / in_scale) + in_zero, info.min, info.max)
+        for i in range(len(batch)):
+            # View ke buffer internal harus dilepas sebelum invoke()
+            interpreter.tensor(input_index)()[0] = batch[i]
+            interpreter.invoke()
+            out[i] = interpreter.tensor(output_index)()[0]
+        if out_scale:
+            out -= out_zero
+            out *= out_scale
+        return out
+
+
+class EnsembleBackend:
+    name = 'ensemble'
+
+    def __init__(self, model_dir='models'):
+        """
+        Menggabungkan model lstm_model_fold_N.h5 menjadi satu graph Keras
+        sehingga satu batch fitur dinilai oleh semua fold dalam satu predict.
+        Output berbentuk (N, n_folds, n_classes).
+        """
+        import tensorflow as tf
+        self.model_path = model_dir
+        self.fold_paths = find_fold_models(model_dir)
+        if not self.fold_paths:
+            raise FileNotFoundError(f"No fold models found in {model_dir}")
+
+        folds = []
+        for fold, path in self.fold_paths:
+            model = tf.keras.models.load_model(path, compile=False)
+            # Nama sub-model harus unik di dalam satu graph
+            try:
+                model.name = f'fold_{fold}'
+            except AttributeError:
+                model._name = f'fold_{fold}'
+            folds.append(model)
+
+        inputs = tf.keras.Input(shape=folds[0].input_shape[1:])
+        outputs = tf.keras.layers.Concatenate(axis=-1)([model(inputs) for model in folds])
+        n_classes = folds[0].output_shape[-1]
+        outputs = tf.keras.layers.Reshape((len(folds), n_classes))(outputs)
+        self.model = tf.keras.Model(inputs, outputs, name='fold_ensemble')
+        self.n_folds = len(folds)
+
+    def predict(self, batch):
+        return self.model.predict_on_batch(batch)
+
+
+def find_fold_models(model_dir='models'):
+    """
+    Daftar (nomor_fold, path) untuk lstm_model_fold_N.h5, urut berdasarkan fold
+    """
+    folds = []
+    for filename in os.listdir(model_dir):
+        match = FOLD_MODEL_PATTERN.match(filename)
+        if match:
+            folds.append((int(match.group(1)), os.path.join(model_dir, filename)))
+    return sorted(folds)
+
+
+def load_backend(kind='keras', model_path=None, **kwargs):
+    """
+    Memuat backend inferensi berdasarkan nama ('keras', 'tflite' atau 'ensemble')
+    """
+    if kind not in DEFAULT_MODEL_PATHS:
+        raise ValueError(f"Unknown model backend: {kind}")
+    model_path = model_path or DEFAULT_MODEL_PATHS[kind]
+    if kind == 'tflite':
+        return TFLiteBackend(model_path, num_threads=kwargs.get('num_threads', 1),
+                             pool_size=kwargs.get('pool_size'))
+    if kind == 'ensemble':
+        return EnsembleBackend(model_path)
+    return KerasBackend(model_path)
+
+
+class _PendingItem:
+    __slots__ = ('features', 'future', 'enqueued_at')
+
+    def __init__(self, features):
+        self.features = features
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class BatchScheduler:
+    def __init__(self, predict_fn, max_batch_size=16, max_wait_ms=5.0, logger=None):
+        """
+        Mengumpulkan fitur dari request yang datang bersamaan menjadi satu batch,
+        menjalankan satu kali predict per batch, lalu mengembalikan hasil ke
+        masing-masing pemanggil
+        """
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.logger = logger or logging.getLogger(__name__)
+
+        self._queue = queue.Queue()
+        self._closed = False
+        self._submit_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._batch_sizes = {}
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+        self._thread = threading.Thread(target=self._run, name='batch-scheduler', daemon=True)
+        self._thread.start()
+
+    def submit(self, features):
+        """
+        Memasukkan fitur berbentuk (1, 94, 13) ke antrian, mengembalikan Future
+        """
+        if features.ndim == 2:
+            features = np.expand_dims(features, axis=0)
+        item = _PendingItem(features)
+        with self._submit_lock:
+            if not self._closed:
+                self._queue.put(item)
+                return item.future
+        # Scheduler sudah ditutup (misalnya model diganti): jalankan langsung
+        self._run_batch([item])
+        return item.future
+
+    def submit_many(self, batch):
+        """
+        Memasukkan setiap sampel batch (N, 94, 13) sebagai item terpisah,
+        sehingga batch besar dipecah per max_batch_size dan bergantian dengan
+        request lain; mengembalikan daftar Future sesuai urutan sampel
+        """
+        items = [_PendingItem(batch[i:i + 1]) for i in range(len(batch))]
+        with self._submit_lock:
+            if not self._closed:
+                for item in items:
+                    self._queue.put(item)
+                return [item.future for item in items]
+        for start in range(0, len(items), self.max_batch_size):
+            self._run_batch(items[start:start + self.max_batch_size])
+        return [item.future for item in items]
+
+    def predict(self, features, timeout=None):
+        """
+        Menunggu hasil prediksi untuk satu sampel (baris output model)
+        """
+        return self.submit(features).result(timeout=timeout)
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    item = self._queue.get_nowait()
+                else:
+                    item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # Teruskan sinyal berhenti setelah batch ini selesai
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch = self._collect(first)
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        started = time.monotonic()
+        waits = [started - item.enqueued_at for item in batch]
+        self._record(len(batch), waits)
+
+        try:
+            inputs = np.concatenate([item.features for item in batch], axis=0)
+            predictions = self.predict_fn(inputs)
+        except Exception as e:
+            self.logger.error(f"Batch prediction failed (size={len(batch)}): {e}", exc_info=True)
+            for item in batch:
+                item.future.set_exception(e)
+            return
+
+        for i, item in enumerate(batch):
+            item.future.set_result(predictions[i])
+
+    def _record(self, size, waits):
+        with self._stats_lock:
+            self._batches += 1
+            self._items += size
+            self._batch_sizes[size] = self._batch_sizes.get(size, 0) + 1
+            self._wait_total += sum(waits)
+            self._wait_max = max(self._wait_max, max(waits))
+
+    def stats(self):
+        """
+        Mengembalikan counter ukuran batch dan waktu tunggu antrian
+        """
+        with self._stats_lock:
+            return {
+                'batches_total': self._batches,
+                'items_total': self._items,
+                'batch_size_counts': dict(sorted(self._batch_sizes.items())),
+                'avg_batch_size': self._items / self._batches if self._batches else 0.0,
+                'queue_wait_seconds_total': self._wait_total,
+                'queue_wait_seconds_avg': self._wait_total / self._items if self._items else 0.0,
+                'queue_wait_seconds_max': self._wait_max,
+                'queue_depth': self._queue.qsize(),
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000.0
+            }
+
+    def close(self, timeout=5.0):
+        """
+        Menghentikan worker setelah antrian yang tersisa diproses
+        """
+        with self._submit_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join(timeout=timeout)
+
+
+def current_rss_mb():
+    """
+    Resident set size proses saat ini dalam MB (Linux), fallback ke peak RSS
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def profile_backend(backend, batch_size=1, repeats=50, warmup=5, input_shape=(94, 13)):
+    """
+    Mengukur latensi predict (detik) untuk ukuran batch tertentu
+    """
+    batch = np.random.default_rng(0).standard_normal((batch_size,) + input_shape).astype(np.float32)
+    for _ in range(warmup):
+        backend.predict(batch)
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        backend.predict(batch)
+        timings.append(time.perf_counter() - started)
+    timings = np.array(timings)
+    return {
+        'batch_size': batch_size,
+        'p50_ms': float(np.percentile(timings, 50) * 1000),
+        'p95_ms': float(np.percentile(timings, 95) * 1000),
+        'p99_ms': float(np.percentile(timings, 99) * 1000),
+        'samples_per_sec': float(batch_size * repeats / timings.sum())
+    }
+
+
+def compare_ensemble(model_dir='models', single_path=None, batch_sizes=(1, 16), repeats=50):
+    """
+    Membandingkan latensi dan memori mode model tunggal dengan mode ensemble
+    """
+    # Runtime TensorFlow (termasuk inisialisasi predict pertama) dipanaskan
+    # dulu dengan model kecil agar tidak terhitung sebagai memori model
+    import tensorflow as tf
+    probe = tf.keras.Sequential([tf.keras.Input(shape=(94, 13)), tf.keras.layers.LSTM(4)])
+    probe.predict(np.zeros((1, 94, 13), dtype=np.float32), verbose=0)
+
+    report = {}
+    for kind, path in (('keras', single_path), ('ensemble', model_dir)):
+        rss_before = current_rss_mb()
+        backend = load_backend(kind, path)
+        rss_loaded = current_rss_mb()
+        backend.predict(np.zeros((1, 94, 13), dtype=np.float32))
+        report[kind] = {
+            'model_path': backend.model_path,
+            'rss_load_mb': rss_loaded - rss_before,
+            'rss_first_predict_mb': current_rss_mb() - rss_loaded,
+            'latency': [profile_backend(backend, size, repeats) for size in batch_sizes]
+        }
+    return report
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description='Compare single-model and fold-ensemble inference cost')
+    parser.add_argument('--model-dir', default='models')
+    parser.add_argument('--single', default=DEFAULT_MODEL_PATHS['keras'])
+    parser.add_argument('--batch-sizes', default='1,16')
+    parser.add_argument('--repeats', type=int, default=50)
+    args = parser.parse_args()
+
+    sizes = tuple(int(size) for size in args.batch_sizes.split(','))
+    print(json.dumps(compare_ensemble(args.model_dir, args.single, sizes, args.repeats), indent=2))
@@ -0,0 +1,231 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def total(self):
+        with self._lock:
+            return sum(self._values.values())
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, _format_labels(self.labelnames, key), value)
+                    for key, value in sorted(self._values.items())]
+
+
+class Gauge(Counter):
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        lines = []
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += bucket_count
+                    labels = _format_labels(self.labelnames, key, ('le', _format_value(bound)))
+                    lines.append((f'{self.name}_bucket', labels, cumulative))
+                labels = _format_labels(self.labelnames, key)
+                lines.append((f'{self.name}_sum', labels, total))
+                lines.append((f'{self.name}_count', labels, count))
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        """
+        Kumpulan metrik proses yang dirender dalam format teks Prometheus
+        """
+        self._metrics = []
+        self._collectors = []
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._add(Counter(name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._add(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help_text, labelnames, buckets))
+
+    def register_collector(self, collect):
+        """
+        collect() dipanggil saat render dan mengembalikan daftar metrik
+        (misalnya Gauge) berisi nilai terbaru dari komponen lain
+        """
+        self._collectors.append(collect)
+
+    def render(self):
+        metrics = list(self._metrics)
+        for collect in self._collectors:
+            metrics.extend(collect())
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{labels} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+class RequestTimer:
+    def __init__(self, histogram):
+        """
+        Timer per request: setiap stage dicatat ke histogram bersama dan
+        disimpan (ms) untuk baris log request
+        """
+        self.histogram = histogram
+        self.timings = {}
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.histogram.observe(elapsed, stage=name)
+            self.timings[name] = round(elapsed * 1000, 3)
+
+    def total_ms(self):
+        return round((time.perf_counter() - self._started) * 1000, 3)
+
+
+class RollingWindowCounter:
+    FIELDS = ('total', 'urgent', 'confidence_sum', 'confidence_count')
+
+    def __init__(self, window_seconds=86400, slot_seconds=60):
+        """
+        Jumlah deteksi dalam jendela bergulir (default 24 jam) yang disimpan
+        sebagai ring buffer slot per menit; query tidak bergantung pada
+        banyaknya record di database
+        """
+        self.window_seconds = window_seconds
+        self.slot_seconds = slot_seconds
+        self._size = window_seconds // slot_seconds
+        self._slots = [None] * self._size
+        self._values = [[0, 0, 0.0, 0] for _ in range(self._size)]
+        self._lock = threading.Lock()
+
+    def _slot(self, slot_id):
+        index = slot_id % self._size
+        if self._slots[index] != slot_id:
+            self._slots[index] = slot_id
+            self._values[index] = [0, 0, 0.0, 0]
+        return self._values[index]
+
+    def add(self, is_urgent, confidence=None, timestamp=None):
+        slot_id = int((time.time() if timestamp is None else timestamp) // self.slot_seconds)
+        with self._lock:
+            values = self._slot(slot_id)
+            values[0] += 1
+            values[1] += 1 if is_urgent else 0
+            if confidence is not None:
+                values[2] += float(confidence)
+                values[3] += 1
+
+    def seed(self, timestamp, totals):
+        """
+        Mengisi slot dari bucket rollup yang sudah ada (misalnya saat startup)
+        """
+        slot_id = int(timestamp // self.slot_seconds)
+        with self._lock:
+            values = self._slot(slot_id)
+            for i, field in enumerate(self.FIELDS):
+                values[i] += totals.get(field, 0)
+
+    def totals(self, seconds=None, now=None):
+        """
+        Jumlah per field untuk `seconds` terakhir (maksimal window_seconds),
+        dengan resolusi satu slot; slot berjalan ikut dihitung
+        """
+        seconds = self.window_seconds if seconds is None else min(seconds, self.window_seconds)
+        current = int((time.time() if now is None else now) // self.slot_seconds)
+        oldest = current - max(int(seconds // self.slot_seconds), 1) + 1
+        result = [0, 0, 0.0, 0]
+        with self._lock:
+            for slot_id, values in zip(self._slots, self._values):
+                if slot_id is not None and oldest <= slot_id <= current:
+                    for i, value in enumerate(values):
+                        result[i] += value
+        return dict(zip(self.FIELDS, result))
@@ -0,0 +1,148 @@
+import hmac
+import hashlib
+import logging
+import threading
+from collections import deque, defaultdict
+
+ADMIN_ROOM = 'admins'
+
+
+def user_room(user_id):
+    return f'user:{user_id}'
+
+
+def user_room_token(secret, user_id):
+    """
+    Token untuk masuk room 'user:<id>': HMAC-SHA256(secret, user_id) dalam
+    hex. Diterbitkan oleh sisi server yang sudah mengautentikasi user
+    (misalnya saat login) dan dikirim klien sebagai auth['user_token'].
+    """
+    return hmac.new(secret.encode(), str(user_id).encode(), hashlib.sha256).hexdigest()
+
+
+def rooms_for(auth, admin_token=None, user_secret=None):
+    """
+    Room untuk klien Socket.IO yang baru terhubung berdasarkan data auth.
+    Keduanya fail closed:
+    - 'admins': {'admin_token': ...} harus sama dengan ADMIN_TOKEN yang
+      dikonfigurasi; tanpa ADMIN_TOKEN tidak ada klien yang masuk.
+    - 'user:<id>': {'user_id': ..., 'user_token': ...} dengan user_token dari
+      user_room_token(ROOM_TOKEN_SECRET, user_id); tanpa secret room user
+      tidak bisa dimasuki.
+    """
+    auth = auth or {}
+    rooms = []
+    user_id = auth.get('user_id')
+    if user_id and user_secret and hmac.compare_digest(
+            str(auth.get('user_token', '')), user_room_token(user_secret, user_id)):
+        rooms.append(user_room(user_id))
+    if admin_token and hmac.compare_digest(str(auth.get('admin_token', '')), admin_token):
+        rooms.append(ADMIN_ROOM)
+    return rooms
+
+
+def detection_payload(record):
+    """
+    Bentuk JSON record deteksi untuk klien (tanpa ObjectId/datetime mentah)
+    """
+    payload = {
+        'id': str(record['_id']) if '_id' in record else None,
+        'user_id': record['user_id'],
+        'timestamp': record['timestamp'].isoformat(),
+        'is_urgent': bool(record['is_urgent']),
+        'confidence': record.get('confidence'),
+        'model_version': record.get('model_version'),
+        'source': record.get('source', 'upload')
+    }
+    for field in ('mode', 'urgent_segments', 'fold_spread'):
+        if field in record:
+            payload[field] = record[field]
+    return payload
+
+
+class DetectionNotifier:
+    def __init__(self, emit, batch_interval=0.5, max_batch=200, max_pending=10000, logger=None):
+        """
+        Fan-out event deteksi ke room 'admins' dan 'user:<id>'. Payload dibuat
+        sekali per deteksi dan dikirim dengan satu emit ke semua room tujuan,
+        sehingga paket Socket.IO hanya di-encode sekali untuk semua penerima.
+        Deteksi darurat langsung dikirim sebagai 'new_detection'; deteksi
+        normal dikumpulkan selama batch_interval detik dan dikirim sebagai
+        'detection_batch'. emit(event, data, to=rooms) biasanya socketio.emit.
+        """
+        self.emit = emit
+        self.batch_interval = batch_interval
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.logger = logger or logging.getLogger(__name__)
+
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self.stats = {'immediate': 0, 'batched': 0, 'batches': 0, 'dropped': 0}
+
+        self._thread = threading.Thread(target=self._run, name='detection-notifier', daemon=True)
+        self._thread.start()
+
+    def publish(self, record):
+        payload = detection_payload(record)
+        if payload['is_urgent']:
+            self._send('new_detection', payload, [ADMIN_ROOM, user_room(payload['user_id'])])
+            self.stats['immediate'] += 1
+            return
+        with self._cond:
+            if len(self._pending) >= self.max_pending:
+                self._pending.popleft()
+                self.stats['dropped'] += 1
+            self._pending.append(payload)
+            if len(self._pending) >= self.max_batch:
+                self._cond.notify()
+
+    def pending(self):
+        with self._cond:
+            return len(self._pending)
+
+    def _send(self, event, data, rooms):
+        try:
+            self.emit(event, data, to=rooms)
+        except Exception as e:
+            self.logger.error(f"Error emitting {event} to {rooms}: {e}")
+
+    def flush(self):
+        """
+        Mengirim deteksi normal yang tertunda: satu batch untuk admin dan
+        satu batch per user yang punya deteksi baru
+        """
+        with self._flush_lock:
+            while True:
+                with self._cond:
+                    batch = [self._pending.popleft() for _ in range(min(len(self._pending), self.max_batch))]
+                if not batch:
+                    return
+                by_user = defaultdict(list)
+                for payload in batch:
+                    by_user[payload['user_id']].append(payload)
+                self._send('detection_batch', {'detections': batch}, [ADMIN_ROOM])
+                for user_id, detections in by_user.items():
+                    self._send('detection_batch', {'detections': detections}, [user_room(user_id)])
+                self.stats['batched'] += len(batch)
+                self.stats['batches'] += 1
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._closed and len(self._pending) < self.max_batch:
+                    self._cond.wait(timeout=self.batch_interval)
+                if self._closed:
+                    return
+            self.flush()
+
+    def close(self, timeout=5.0):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout=timeout)
+        self.flush()
@@ -0,0 +1,191 @@
+import os
+import json
+import time
+import logging
+import argparse
+import tempfile
+
+import numpy as np
+
+from audio import decode_audio
+from features import extract_window_features
+from inference import TFLiteBackend, interpret_prediction, load_backend
+from score_batch import list_inputs
+
+logger = logging.getLogger(__name__)
+
+MODES = ('dynamic', 'int8')
+
+
+def representative_features(source, limit=500, sr=16000):
+    """
+    Tensor MFCC (N, 94, 13) dari file audio di `source` (direktori atau
+    manifest). Rekaman panjang menyumbang beberapa jendela sehingga set
+    kalibrasi tetap beragam walaupun jumlah file sedikit.
+    """
+    batches = []
+    total = 0
+    for path in list_inputs(source):
+        try:
+            with open(path, 'rb') as f:
+                audio_data, sr = decode_audio(f.read(), target_sr=sr)
+        except Exception as e:
+            logger.warning(f"Skipping {path}: {e}")
+            continue
+        features, _ = extract_window_features(audio_data, sr)
+        batches.append(features)
+        total += len(features)
+        if total >= limit:
+            break
+    if not batches:
+        raise ValueError(f"No usable audio found in {source}")
+    return np.concatenate(batches)[:limit]
+
+
+def convert(model_path, mode, calibration=None):
+    """
+    Konversi model Keras (.h5) ke TFLite: 'dynamic' (bobot int8, aktivasi
+    float) atau 'int8' (bobot dan aktivasi int8, termasuk input/output,
+    dikalibrasi dengan `calibration`)
+    """
+    import tensorflow as tf
+    model = tf.keras.models.load_model(model_path, compile=False)
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if mode == 'int8':
+        if calibration is None:
+            raise ValueError("Full-int8 conversion needs calibration features")
+
+        def representative_dataset():
+            for features in calibration:
+                yield [features[None].astype(np.float32)]
+
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+    elif mode != 'dynamic':
+        raise ValueError(f"Unknown quantization mode: {mode}")
+    return converter.convert()
+
+
+def per_sample_latency_ms(backend, features, repeats=50):
+    """
+    Median latensi satu sampel (seperti request /process_audio tanpa batching)
+    """
+    samples = features[np.arange(repeats) % len(features)]
+    backend.predict(samples[:1])
+    timings = np.empty(repeats)
+    for i in range(repeats):
+        started = time.perf_counter()
+        backend.predict(samples[i:i + 1])
+        timings[i] = time.perf_counter() - started
+    return float(np.median(timings) * 1000)
+
+
+def evaluate(reference, candidate, features):
+    """
+    Kesesuaian keputusan dan selisih confidence kandidat terhadap model float
+    """
+    expected = [interpret_prediction(row) for row in reference]
+    actual = [interpret_prediction(row) for row in candidate]
+    diff = np.abs(np.array([c for _, c in expected]) - np.array([c for _, c in actual]))
+    return {
+        'agreement': float(np.mean([e[0] == a[0] for e, a in zip(expected, actual)])),
+        'confidence_mae': float(diff.mean()),
+        'confidence_max_diff': float(diff.max()),
+        'samples': len(features)
+    }
+
+
+def write_model(path, data):
+    """
+    Menulis model hasil konversi lewat berkas sementara di direktori yang sama
+    lalu os.replace, sehingga ModelRegistry.scan tidak pernah melihat .tflite
+    yang kosong atau terpotong
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def quantize_model(model_path, calibration, evaluation, output_dir, modes=MODES, repeats=50):
+    """
+    Menghasilkan varian TFLite untuk satu model .h5 dan laporannya
+    """
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    float_backend = load_backend('keras', model_path)
+    reference = float_backend.predict(evaluation)
+    report = {
+        'float': {
+            'path': model_path,
+            'size_bytes': os.path.getsize(model_path),
+            'latency_ms': per_sample_latency_ms(float_backend, evaluation, repeats)
+        }
+    }
+    for mode in modes:
+        started = time.monotonic()
+        output_path = os.path.join(output_dir, f'{stem}_{mode}.tflite')
+        try:
+            write_model(output_path, convert(model_path, mode, calibration))
+        except Exception as e:
+            logger.error(f"Error converting {model_path} ({mode}): {e}")
+            report[mode] = {'error': str(e)}
+            continue
+        backend = TFLiteBackend(output_path)
+        report[mode] = {
+            'path': output_path,
+            'size_bytes': os.path.getsize(output_path),
+            'latency_ms': per_sample_latency_ms(backend, evaluation, repeats),
+            'convert_seconds': round(time.monotonic() - started, 1),
+            **evaluate(reference, backend.predict(evaluation), evaluation)
+        }
+        logger.info(f"{output_path}: agreement={report[mode]['agreement']:.1%} "
+                    f"latency={report[mode]['latency_ms']:.2f}ms size={report[mode]['size_bytes']} bytes")
+    return report
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Convert Keras models to quantized TFLite and report the accuracy/latency cost')
+    parser.add_argument('models', nargs='*', help='.h5 files (default: every .h5 in models/)')
+    parser.add_argument('--calibration', default='data', help='Directory or manifest of audio used for calibration')
+    parser.add_argument('--evaluation', default=None, help='Held-out audio for the agreement report (default: calibration set)')
+    parser.add_argument('--samples', type=int, default=500, help='Maximum MFCC windows per set')
+    parser.add_argument('--output-dir', default='models')
+    parser.add_argument('--modes', default=','.join(MODES))
+    parser.add_argument('--report', default='quantization_report.json')
+    args = parser.parse_args()
+
+    model_paths = args.models or sorted(
+        os.path.join('models', name) for name in os.listdir('models') if name.endswith('.h5'))
+    calibration = representative_features(args.calibration, args.samples)
+    evaluation = representative_features(args.evaluation, args.samples) if args.evaluation else calibration
+    logger.info(f"{len(calibration)} calibration windows, {len(evaluation)} evaluation windows")
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    report = {
+        'calibration': {'source': args.calibration, 'windows': len(calibration)},
+        'evaluation': {'source': args.evaluation or args.calibration, 'windows': len(evaluation)},
+        'models': {}
+    }
+    for model_path in model_paths:
+        report['models'][model_path] = quantize_model(
+            model_path, calibration, evaluation, args.output_dir, args.modes.split(','))
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    for model_path, result in report['models'].items():
+        print(f"{model_path}: float {result['float']['latency_ms']:.2f}ms {result['float']['size_bytes']} bytes")
+        for mode in args.modes.split(','):
+            entry = result.get(mode, {})
+            if 'error' in entry:
+                print(f"  {mode:8s} failed: {entry['error']}")
+            else:
+                print(f"  {mode:8s} agreement={entry['agreement']:.1%} mae={entry['confidence_mae']:.4f} "
+                      f"{entry['latency_ms']:.2f}ms {entry['size_bytes']} bytes")
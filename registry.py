@@ -0,0 +1,240 @@
+import os
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from features import extract_features
+from inference import BatchScheduler, FOLD_MODEL_PATTERN, load_backend
+from worker_pool import PoolServingModel
+
+MODEL_EXTENSIONS = {
+    '.h5': 'keras',
+    '.tflite': 'tflite'
+}
+
+
+def model_version(kind, path):
+    return f'{kind}:{os.path.basename(os.path.normpath(path))}'
+
+
+class ServingModel:
+    remote = False
+
+    def __init__(self, version, backend, scheduler=None):
+        """
+        Satu versi model yang siap melayani request: backend beserta scheduler-nya
+        """
+        self.version = version
+        self.backend = backend
+        self.scheduler = scheduler
+        self.loaded_at = time.time()
+
+    def predict(self, features):
+        """
+        Prediksi satu sampel fitur, lewat scheduler jika batching aktif
+        """
+        if self.scheduler is not None:
+            return self.scheduler.predict(features)
+        return self.backend.predict(features)[0]
+
+    def predict_batch(self, batch):
+        """
+        Prediksi banyak sampel (misalnya jendela rekaman panjang). Dengan
+        batching aktif sampel dilewatkan ke scheduler seperti request lain;
+        tanpa scheduler backend dipanggil langsung (TFLite memakai pool
+        interpreter yang ukurannya tetap).
+        """
+        if self.scheduler is not None and len(batch):
+            return np.stack([future.result() for future in self.scheduler.submit_many(batch)])
+        return self.backend.predict(batch)
+
+    def warm_up(self):
+        """
+        Menjalankan jalur MFCC dan predict sekali dengan input dummy agar
+        pembuatan filterbank dan tracing fungsi predict terjadi sebelum request pertama
+        """
+        dummy_audio = (0.01 * np.random.default_rng(0).standard_normal(16000)).astype(np.float32)
+        features = extract_features(dummy_audio, 16000)
+        self.backend.predict(np.zeros((1, 94, 13), dtype=np.float32))
+        self.backend.predict(features)
+        # Batch >1 (scheduler dan mode rekaman panjang) memicu tracing ulang satu kali
+        self.backend.predict(np.zeros((2, 94, 13), dtype=np.float32))
+        if self.scheduler is not None:
+            self.scheduler.predict(features)
+
+    def close(self):
+        # Request yang sudah antri tetap diproses sebelum scheduler berhenti
+        if self.scheduler is not None:
+            self.scheduler.close()
+
+
+class ModelRegistry:
+    def __init__(self, model_dir='models', batch_max_size=16, batch_max_wait_ms=5.0,
+                 tflite_threads=1, tflite_pool_size=None, workers=0, vad=None, on_swap=None,
+                 drain_timeout=60.0, logger=None):
+        """
+        Registry model di direktori `model_dir`. Versi baru dimuat dan
+        di-warm-up di background lalu ditukar secara atomik; request yang
+        sedang berjalan (dipegang lewat acquire()) tetap selesai dengan versi
+        lama, yang baru ditutup setelah request tersebut selesai atau setelah
+        drain_timeout detik. Dengan workers > 0
+        setiap versi dilayani oleh pool proses worker (dengan gate `vad`).
+        """
+        self.model_dir = model_dir
+        self.batch_max_size = batch_max_size
+        self.batch_max_wait_ms = batch_max_wait_ms
+        self.tflite_threads = tflite_threads
+        self.tflite_pool_size = tflite_pool_size
+        self.workers = workers
+        self.vad = vad
+        self.on_swap = on_swap
+        self.drain_timeout = drain_timeout
+        self.logger = logger or logging.getLogger(__name__)
+
+        self._extra = {}
+        self._lock = threading.Lock()
+        # Jumlah request yang sedang memakai setiap versi (id(serving) -> jumlah)
+        self._inflight = {}
+        self._drained = threading.Condition(self._lock)
+        self._active = None
+        self._loading = None
+        self.last_error = None
+        self.history = []
+
+    def scan(self):
+        """
+        Daftar versi yang tersedia: setiap .h5/.tflite di model_dir, ditambah
+        ensemble jika ada model fold
+        """
+        versions = dict(self._extra)
+        has_folds = False
+        for filename in sorted(os.listdir(self.model_dir)):
+            kind = MODEL_EXTENSIONS.get(os.path.splitext(filename)[1].lower())
+            if kind is None:
+                continue
+            path = os.path.join(self.model_dir, filename)
+            versions[model_version(kind, path)] = (kind, path)
+            has_folds = has_folds or bool(FOLD_MODEL_PATTERN.match(filename))
+        if has_folds:
+            versions[model_version('ensemble', self.model_dir)] = ('ensemble', self.model_dir)
+        return versions
+
+    def register(self, kind, path):
+        """
+        Mendaftarkan model di luar model_dir (misalnya dari MODEL_PATH)
+        """
+        version = model_version(kind, path)
+        self._extra[version] = (kind, path)
+        return version
+
+    @property
+    def active(self):
+        return self._active
+
+    @contextmanager
+    def acquire(self):
+        """
+        Versi aktif untuk satu request. Versi yang diganti baru ditutup setelah
+        semua request yang memegangnya selesai (lihat _activate).
+        """
+        with self._lock:
+            serving = self._active
+            if serving is not None:
+                self._inflight[id(serving)] = self._inflight.get(id(serving), 0) + 1
+        try:
+            yield serving
+        finally:
+            if serving is not None:
+                with self._lock:
+                    self._inflight[id(serving)] -= 1
+                    if not self._inflight[id(serving)]:
+                        del self._inflight[id(serving)]
+                        self._drained.notify_all()
+
+    def _wait_drained(self, serving, timeout):
+        with self._drained:
+            return self._drained.wait_for(lambda: id(serving) not in self._inflight, timeout=timeout)
+
+    def load(self, version):
+        """
+        Memuat dan warm-up satu versi tanpa mengaktifkannya
+        """
+        versions = self.scan()
+        if version not in versions:
+            raise KeyError(f"Unknown model version: {version}")
+        kind, path = versions[version]
+        self.logger.info(f"Loading model {version}...")
+        if self.workers > 0:
+            serving = PoolServingModel(version, kind, path, self.workers, vad=self.vad, logger=self.logger)
+        else:
+            backend = load_backend(kind, path, num_threads=self.tflite_threads, pool_size=self.tflite_pool_size)
+            scheduler = None
+            if self.batch_max_size > 0:
+                scheduler = BatchScheduler(
+                    backend.predict,
+                    max_batch_size=self.batch_max_size,
+                    max_wait_ms=self.batch_max_wait_ms,
+                    logger=self.logger
+                )
+            serving = ServingModel(version, backend, scheduler)
+        try:
+            serving.warm_up()
+        except Exception:
+            serving.close()
+            raise
+        return serving
+
+    def activate(self, version, background=True):
+        """
+        Memuat versi baru lalu menukarnya dengan versi aktif.
+        Mengembalikan thread loader jika background=True.
+        """
+        if version not in self.scan():
+            raise KeyError(f"Unknown model version: {version}")
+        with self._lock:
+            if self._loading is not None:
+                raise RuntimeError(f"Model {self._loading} is already loading")
+            self._loading = version
+
+        if not background:
+            self._activate(version)
+            return None
+        thread = threading.Thread(target=self._activate, args=(version,), name='model-loader', daemon=True)
+        thread.start()
+        return thread
+
+    def _activate(self, version):
+        try:
+            serving = self.load(version)
+            with self._lock:
+                previous, self._active = self._active, serving
+            self.history.append({'version': version, 'activated_at': time.time()})
+            self.last_error = None
+            if self.on_swap is not None:
+                self.on_swap(serving, previous)
+            if previous is not None:
+                if not self._wait_drained(previous, self.drain_timeout):
+                    self.logger.warning(f"Closing model {previous.version} with requests still in flight")
+                previous.close()
+            self.logger.info(f"Model {version} is now active")
+        except Exception as e:
+            self.last_error = f"{version}: {e}"
+            self.logger.error(f"Error activating model {version}: {e}", exc_info=True)
+            if self._active is None:
+                raise
+        finally:
+            with self._lock:
+                self._loading = None
+
+    def status(self):
+        active = self._active
+        return {
+            'active': active.version if active else None,
+            'loading': self._loading,
+            'last_error': self.last_error,
+            'available': sorted(self.scan()),
+            'history': self.history[-20:]
+        }
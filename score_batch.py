@@ -0,0 +1,198 @@
+import os
+import csv
+import json
+import time
+import logging
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+
+from audio import decode_audio
+from features import extract_features_batch
+from inference import interpret_prediction, load_backend, prediction_spread
+
+logger = logging.getLogger(__name__)
+
+AUDIO_EXTENSIONS = ('.wav', '.flac', '.ogg', '.opus')
+OUTPUT_FIELDS = ['path', 'is_urgent', 'confidence', 'fold_std', 'duration', 'model_version', 'error']
+
+
+def list_inputs(source):
+    """
+    Daftar file audio dari direktori (rekursif) atau file manifest
+    (satu path per baris, atau CSV dengan kolom 'path')
+    """
+    if os.path.isdir(source):
+        paths = []
+        for root, _, files in os.walk(source):
+            for filename in files:
+                if filename.lower().endswith(AUDIO_EXTENSIONS):
+                    paths.append(os.path.join(root, filename))
+        return sorted(paths)
+
+    with open(source, newline='') as f:
+        if source.lower().endswith('.csv'):
+            return [row['path'] for row in csv.DictReader(f) if row.get('path')]
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+
+def featurize_chunk(paths, sr=16000):
+    """
+    Dijalankan di worker process: decode dan ekstraksi MFCC untuk beberapa file
+    """
+    results = []
+    clips = []
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                audio_data, _ = decode_audio(f.read(), target_sr=sr)
+            clips.append((path, audio_data))
+        except Exception as e:
+            results.append((path, None, None, f'decode failed: {e}'))
+    if clips:
+        features = extract_features_batch([audio_data for _, audio_data in clips], sr)
+        for (path, audio_data), row in zip(clips, features):
+            results.append((path, row, len(audio_data) / sr, None))
+    return results
+
+
+class ResultWriter:
+    def __init__(self, path):
+        """
+        Menulis hasil ke CSV atau JSONL (berdasarkan ekstensi) secara append,
+        sekaligus menjadi checkpoint untuk resume
+        """
+        self.path = path
+        self.jsonl = path.lower().endswith('.jsonl')
+        self._repair_tail()
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, 'a', newline='')
+        self._csv = None
+        if not self.jsonl:
+            self._csv = csv.DictWriter(self._file, fieldnames=OUTPUT_FIELDS)
+            if is_new:
+                self._csv.writeheader()
+
+    def _repair_tail(self):
+        # Buang baris terakhir yang terpotong akibat proses berhenti di tengah tulis
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb+') as f:
+            data = f.read()
+            if data and not data.endswith(b'\n'):
+                f.truncate(data.rfind(b'\n') + 1)
+
+    def completed(self):
+        """
+        Path yang sudah tercatat di output (untuk resume)
+        """
+        if not os.path.exists(self.path):
+            return set()
+        done = set()
+        with open(self.path, newline='') as f:
+            if self.jsonl:
+                for line in f:
+                    try:
+                        done.add(json.loads(line)['path'])
+                    except (ValueError, KeyError):
+                        continue
+            else:
+                done.update(row['path'] for row in csv.DictReader(f) if row.get('path'))
+        return done
+
+    def write(self, rows):
+        for row in rows:
+            if self.jsonl:
+                self._file.write(json.dumps(row) + '\n')
+            else:
+                self._csv.writerow(row)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def score_batch(results, backend, writer, model_version):
+    """
+    Satu predict untuk satu batch fitur, hasil langsung ditulis ke output
+    """
+    rows = []
+    ready = [(path, row, duration) for path, row, duration, error in results if error is None]
+    if ready:
+        predictions = backend.predict(np.stack([row for _, row, _ in ready]))
+        for (path, _, duration), prediction in zip(ready, predictions):
+            is_urgent, confidence = interpret_prediction(prediction)
+            spread = prediction_spread(prediction)
+            rows.append({
+                'path': path,
+                'is_urgent': is_urgent,
+                'confidence': confidence,
+                'fold_std': spread['fold_std'] if spread else None,
+                'duration': duration,
+                'model_version': model_version,
+                'error': None
+            })
+    for path, _, _, error in results:
+        if error is not None:
+            rows.append({'path': path, 'model_version': model_version, 'error': error})
+    writer.write(rows)
+    return len(rows)
+
+
+def run(source, output, backend_kind='keras', model_path=None, workers=None,
+        batch_size=64, chunk_size=16):
+    writer = ResultWriter(output)
+    done = writer.completed()
+    paths = [path for path in list_inputs(source) if path not in done]
+    logger.info(f"{len(paths)} files to score ({len(done)} already in {output})")
+    if not paths:
+        writer.close()
+        return 0
+
+    workers = workers or os.cpu_count() or 1
+    # Spawn agar worker tidak mewarisi state TensorFlow dari proses utama
+    context = multiprocessing.get_context('spawn')
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+    max_inflight = workers * 2
+
+    scored = 0
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        backend = load_backend(backend_kind, model_path)
+        model_version = f"{backend.name}:{os.path.basename(backend.model_path)}"
+        started = time.monotonic()
+        pending = set()
+        buffered = []
+        next_chunk = 0
+        while pending or next_chunk < len(chunks):
+            # Jumlah chunk yang sedang diproses dibatasi agar memori tetap datar
+            while next_chunk < len(chunks) and len(pending) < max_inflight:
+                pending.add(pool.submit(featurize_chunk, chunks[next_chunk]))
+                next_chunk += 1
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                buffered.extend(future.result())
+            while len(buffered) >= batch_size or (buffered and not pending and next_chunk >= len(chunks)):
+                batch, buffered = buffered[:batch_size], buffered[batch_size:]
+                scored += score_batch(batch, backend, writer, model_version)
+                elapsed = time.monotonic() - started
+                logger.info(f"Scored {scored}/{len(paths)} files ({scored / elapsed:.1f} files/s)")
+    writer.close()
+    return scored
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Bulk-score audio files with the emergency classifier')
+    parser.add_argument('source', help='Directory of audio files or manifest (.txt / .csv with a path column)')
+    parser.add_argument('output', help='Result file (.csv or .jsonl); existing rows are skipped on resume')
+    parser.add_argument('--backend', default='keras', choices=['keras', 'tflite', 'ensemble'])
+    parser.add_argument('--model-path', default=None)
+    parser.add_argument('--workers', type=int, default=None, help='Featurization processes (default: all cores)')
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--chunk-size', type=int, default=16, help='Files per worker task')
+    args = parser.parse_args()
+
+    run(args.source, args.output, args.backend, args.model_path, args.workers,
+        args.batch_size, args.chunk_size)
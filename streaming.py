@@ -0,0 +1,101 @@
+import numpy as np
+
+from features import (
+    SAMPLE_RATE, MAX_LENGTH, get_basis, log_mel_frames, features_from_log_mel
+)
+
+PCM_DTYPES = {
+    'int16': np.int16,
+    'float32': np.float32
+}
+
+
+class StreamingClassifier:
+    def __init__(self, sr=SAMPLE_RATE, window_frames=MAX_LENGTH, emit_every=8, pcm_format='int16'):
+        """
+        State streaming per sesi: potongan PCM ditampung, frame log-mel dihitung
+        sekali per frame baru (tidak dihitung ulang untuk frame yang overlap),
+        lalu disimpan di ring buffer sepanjang jendela 94 frame
+        """
+        if pcm_format not in PCM_DTYPES:
+            raise ValueError(f"Unsupported PCM format: {pcm_format}")
+        self.sr = sr
+        self.window_frames = window_frames
+        self.emit_every = max(1, int(emit_every))
+        self.pcm_format = pcm_format
+        self.basis = get_basis(sr)
+
+        n_fft = self.basis['n_fft']
+        self.hop = self.basis['hop_length']
+        # Buffer sampel mulai dari awal frame berikutnya; diawali nol seperti center=True
+        self._samples = np.zeros(n_fft * 4, dtype=np.float32)
+        self._filled = n_fft // 2
+        self._ring = np.empty((window_frames, self.basis['mel_t'].shape[1]), dtype=np.float32)
+        self._ring_pos = 0
+        self.total_frames = 0
+        self.total_samples = 0
+        self._since_emit = 0
+
+    def _to_float(self, chunk):
+        if isinstance(chunk, np.ndarray):
+            return chunk.astype(np.float32, copy=False)
+        samples = np.frombuffer(chunk, dtype=PCM_DTYPES[self.pcm_format])
+        if self.pcm_format == 'int16':
+            return samples.astype(np.float32) / 32768.0
+        return samples
+
+    def _append(self, samples):
+        needed = self._filled + len(samples)
+        if needed > len(self._samples):
+            grown = np.zeros(max(needed, 2 * len(self._samples)), dtype=np.float32)
+            grown[:self._filled] = self._samples[:self._filled]
+            self._samples = grown
+        self._samples[self._filled:needed] = samples
+        self._filled = needed
+
+    def push(self, chunk):
+        """
+        Menambahkan potongan PCM; mengembalikan fitur (1, 94, 13) jika sudah
+        waktunya klasifikasi (setiap emit_every frame baru), selain itu None
+        """
+        samples = self._to_float(chunk)
+        self.total_samples += len(samples)
+        self._append(samples)
+
+        n_fft = self.basis['n_fft']
+        if self._filled < n_fft:
+            return None
+        n_new = 1 + (self._filled - n_fft) // self.hop
+        # Frame yang langsung tergeser keluar jendela tidak perlu dihitung
+        skip = max(0, n_new - self.window_frames)
+        start = skip * self.hop
+        log_mel = log_mel_frames(self._samples[start:self._filled], n_new - skip, self.basis)
+
+        slots = (self._ring_pos + np.arange(len(log_mel))) % self.window_frames
+        self._ring[slots] = log_mel
+        self._ring_pos = (self._ring_pos + len(log_mel)) % self.window_frames
+        self.total_frames += n_new
+        self._since_emit += n_new
+
+        # Geser sisa sampel yang belum menjadi frame ke awal buffer
+        consumed = n_new * self.hop
+        remaining = self._filled - consumed
+        self._samples[:remaining] = self._samples[consumed:self._filled]
+        self._filled = remaining
+
+        if self._since_emit < self.emit_every:
+            return None
+        self._since_emit = 0
+        return np.expand_dims(self.window_features(), axis=0)
+
+    def window_features(self):
+        """
+        Fitur MFCC ternormalisasi dari jendela frame terakhir di ring buffer
+        """
+        count = min(self.total_frames, self.window_frames)
+        order = (self._ring_pos - count + np.arange(count)) % self.window_frames
+        return features_from_log_mel(self._ring[order], self.basis, self.window_frames)
+
+    @property
+    def stream_seconds(self):
+        return self.total_samples / self.sr
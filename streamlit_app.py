@@ -2,14 +2,19 @@ import streamlit as st
 import sounddevice as sd
 import soundfile as sf
 import numpy as np
-import requests
 import socketio
 from datetime import datetime
 import os
 import hashlib  
+import heapq
+import threading
+import time
+from collections import deque
 import pandas as pd
 from streamlit_extras.colored_header import colored_header
 from streamlit_extras.stylable_container import stylable_container
+from client import DEFAULT_SERVER_URL, EmergencyClient
+from notifier import user_room_token
 
 # Konfigurasi Halaman
 st.set_page_config(
@@ -55,27 +60,158 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Database Pengguna
+SERVER_URL = os.environ.get('SERVER_URL', DEFAULT_SERVER_URL)
+# Token Socket.IO: ADMIN_TOKEN untuk room 'admins', ROOM_TOKEN_SECRET (sama
+# dengan backend) untuk menerbitkan token room 'user:<id>' setelah login
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+ROOM_TOKEN_SECRET = os.environ.get('ROOM_TOKEN_SECRET')
+# Jeda minimum (detik) antar percobaan koneksi awal LiveFeed yang gagal
+LIVE_RETRY_SECONDS = float(os.environ.get('DASHBOARD_LIVE_RETRY_SECONDS', 10))
+# Umur cache query ke backend (detik) dan interval refresh panel live
+QUERY_TTL = int(os.environ.get('DASHBOARD_QUERY_TTL', 30))
+LIVE_REFRESH_SECONDS = float(os.environ.get('DASHBOARD_REFRESH_SECONDS', 2))
+# /stats dihitung dari counter di memori backend, jadi boleh di-refresh lebih sering
+STATS_TTL = float(os.environ.get('DASHBOARD_STATS_TTL', 5))
+# Batas deteksi yang disimpan per sesi dashboard
+MAX_SESSION_DETECTIONS = 1000
+
+# Akun login (riwayat dan statistik diambil dari backend)
 USERS_DB = {
     "admin": {
         "password": hashlib.sha256("Admin123!".encode()).hexdigest(),
-        "role": "admin",
-        "history": []
+        "role": "admin"
     },
     "user1": {
         "password": hashlib.sha256("User123!".encode()).hexdigest(),
-        "role": "user",
-        "history": []
+        "role": "user"
     }
 }
 
-class AudioRecorder:
-    def __init__(self):
-        self.sio = socketio.Client()
+@st.cache_resource
+def get_client():
+    # Satu session HTTP untuk seluruh rerun Streamlit
+    return EmergencyClient(SERVER_URL)
+
+class LiveFeed:
+    def __init__(self, url, auth=None, error=None, max_events=5000, retry_interval=LIVE_RETRY_SECONDS):
+        """
+        Satu klien Socket.IO per room (admin atau satu user), dipakai bersama
+        oleh sesi Streamlit. Event deteksi disimpan dengan nomor urut; setiap
+        sesi hanya mengambil event setelah nomor urut terakhir yang sudah
+        digabung. `auth` None berarti token belum dikonfigurasi (`error`).
+        """
+        self.url = url
+        self.auth = auth
+        self.error = None if auth else error
+        self.retry_interval = retry_interval
+        self.seq = 0
+        self._events = deque(maxlen=max_events)
+        self._lock = threading.Lock()
+        self._connect_lock = threading.Lock()
+        self._connected_once = False
+        self._next_attempt = 0.0
+        self.sio = socketio.Client(reconnection=True)
+        self.sio.on('new_detection', self._add)
+        self.sio.on('detection_batch', lambda data: self._add(*data['detections']))
+        self.ensure_connected()
+
+    def ensure_connected(self):
+        """
+        Mencoba koneksi awal lagi jika sebelumnya gagal (paling cepat setiap
+        retry_interval). Setelah pernah terhubung, putus koneksi ditangani
+        reconnection bawaan socketio.Client.
+        """
+        if not self.auth or self._connected_once:
+            return
+        with self._connect_lock:
+            now = time.monotonic()
+            if self._connected_once or now < self._next_attempt:
+                return
+            self._next_attempt = now + self.retry_interval
+            try:
+                self.sio.connect(self.url, auth=self.auth, wait_timeout=5)
+                self._connected_once = True
+                self.error = None
+            except Exception as e:
+                self.error = str(e)
+
+    def _add(self, *events):
+        with self._lock:
+            self._events.extend(events)
+            self.seq += len(events)
+
+    def since(self, seq):
+        """
+        (nomor urut terbaru, event setelah `seq`)
+        """
+        with self._lock:
+            missing = min(self.seq - seq, len(self._events))
+            return self.seq, list(self._events)[len(self._events) - missing:]
+
+@st.cache_resource
+def get_admin_feed():
+    # Server hanya memasukkan klien ber-token ke room 'admins'
+    auth = {'admin_token': ADMIN_TOKEN} if ADMIN_TOKEN else None
+    return LiveFeed(SERVER_URL, auth, error="ADMIN_TOKEN belum di-set")
+
+@st.cache_resource
+def get_user_feed(user_id):
+    # Sesi user hanya bergabung ke room 'user:<id>' miliknya sendiri
+    auth = None
+    if ROOM_TOKEN_SECRET:
+        auth = {'user_id': user_id, 'user_token': user_room_token(ROOM_TOKEN_SECRET, user_id)}
+    return LiveFeed(SERVER_URL, auth, error="ROOM_TOKEN_SECRET belum di-set")
+
+# Query backend dengan cache TTL, dipakai bersama oleh semua sesi
+@st.cache_data(ttl=QUERY_TTL, show_spinner=False)
+def fetch_user_history(user_id, limit=50):
+    return get_client().get(f'/user_history/{user_id}', limit=limit)['items']
+
+@st.cache_data(ttl=QUERY_TTL, show_spinner=False)
+def fetch_urgent_cases(hours=24, limit=200):
+    return get_client().get('/urgent_cases', hours=hours, limit=limit)['items']
+
+@st.cache_data(ttl=STATS_TTL, show_spinner=False)
+def fetch_stats(hours=24):
+    return get_client().get('/stats', hours=hours)
+
+def normalize_detection(item):
+    # Record dari REST (_id, 'Y-m-d H:M:S') dan event Socket.IO (id, ISO) disamakan
+    return {
+        'id': item.get('id') or item.get('_id'),
+        'user_id': item['user_id'],
+        'time': datetime.fromisoformat(item['timestamp']),
+        'is_urgent': item['is_urgent'],
+        'confidence': item.get('confidence') or 0.0
+    }
+
+def live_detections(key, feed, initial, predicate=lambda event: True):
+    """
+    Deteksi untuk satu tampilan di session_state: diisi sekali dari query
+    (cache), lalu setiap rerun hanya menggabungkan event baru dari `feed`
+    """
+    if key not in st.session_state:
+        # Nomor urut diambil sebelum query; duplikat disaring lewat id
+        seq = feed.seq
+        items = {}
         try:
-            self.sio.connect('http://localhost:5000')
+            items = {d['id']: d for d in map(normalize_detection, initial())}
         except Exception as e:
-            st.error(f"Koneksi server gagal: {e}")
+            st.warning(f"Gagal memuat data dari server: {e}")
+        st.session_state[key] = {'seq': seq, 'items': items}
+    state = st.session_state[key]
+    state['seq'], events = feed.since(state['seq'])
+    for event in events:
+        if predicate(event):
+            detection = normalize_detection(event)
+            state['items'][detection['id']] = detection
+    if len(state['items']) > MAX_SESSION_DETECTIONS:
+        keep = heapq.nlargest(MAX_SESSION_DETECTIONS, state['items'].values(), key=lambda d: d['time'])
+        state['items'] = {d['id']: d for d in keep}
+    return state
+
+def latest(items, n):
+    return heapq.nlargest(n, items.values(), key=lambda d: d['time'])
 
 # Fungsi Autentikasi
 def handle_login(username, password):
@@ -188,10 +324,10 @@ def user_interface():
                 # Detail Analisis
                 with st.expander("🔬 DETAIL ANALISIS LENGKAP", expanded=True):
                     cols = st.columns(3)
-                    cols[0].metric("Kata Kunci", "Tolong, Bantu")
-                    cols[1].metric("Tingkat Stress", "78%")
-                    cols[2].metric("Intensitas Suara", "85 dB")
-                    st.map(pd.DataFrame({"lat": [-6.2000], "lon": [106.8167]}))
+                    cols[0].metric("Waktu", res['time'])
+                    cols[1].metric("Status Server", res['status'])
+                    cols[2].metric("Selisih Antar Fold", f"{res['fold_spread']:.3f}" if res.get('fold_spread') is not None else "-")
+                    st.audio(res['file'], format="audio/flac")
     
     with col2:
         # Riwayat Rekaman
@@ -200,84 +336,111 @@ def user_interface():
             description="5 rekaman terakhir",
             color_name="blue-70"
         )
-        
-        with stylable_container(
-            key="history_box",
-            css_styles="""
-                {
-                    background: white;
-                    padding: 1rem;
-                    border-radius: 15px;
-                    max-height: 600px;
-                    overflow-y: auto;
-                }
-            """
-        ):
-            for item in USERS_DB[st.session_state.current_user]["history"][-5:]:
-                with st.container():
-                    st.caption(f"🕒 {item['time']}")
-                    st.markdown(f"**{item['status']}** ({item['confidence']}%)")
-                    st.progress(item['confidence']/100)
-                    st.audio(item['file'], format="audio/wav")
-                    st.divider()
+        show_user_history(st.session_state.current_user)
+
+# Riwayat diperbarui dari LiveFeed tanpa rerun seluruh halaman
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+def show_user_history(user_id):
+    feed = get_user_feed(user_id)
+    feed.ensure_connected()
+    if feed.error:
+        st.caption(f"Update live tidak aktif: {feed.error}")
+    history = live_detections(
+        f'history:{user_id}',
+        feed,
+        lambda: fetch_user_history(user_id),
+        lambda event: event['user_id'] == user_id
+    )
+    with stylable_container(
+        key="history_box",
+        css_styles="""
+            {
+                background: white;
+                padding: 1rem;
+                border-radius: 15px;
+                max-height: 600px;
+                overflow-y: auto;
+            }
+        """
+    ):
+        for item in latest(history['items'], 5):
+            with st.container():
+                st.caption(f"🕒 {item['time']:%Y-%m-%d %H:%M:%S}")
+                st.markdown(f"**{'DARURAT' if item['is_urgent'] else 'AMAN'}** ({item['confidence']*100:.0f}%)")
+                st.progress(min(max(item['confidence'], 0.0), 1.0))
+                st.divider()
 
 def handle_recording():
     try:
         with st.spinner("🎙️ Sedang merekam..."):
             fs = 16000
             duration = 5
-            audio = sd.rec(int(duration * fs), samplerate=fs, channels=1)
+            audio = sd.rec(int(duration * fs), samplerate=fs, channels=1, dtype='float32')
             sd.wait()
+            audio = audio[:, 0]
+        
+        with st.spinner("📡 Menganalisis..."):
+            # Dikirim sebagai FLAC (lossless, ~5x lebih kecil dari WAV)
+            response = get_client().classify(audio, fs, st.session_state.current_user)
             
             # Simpan rekaman
-            filename = f"data/{st.session_state.current_user}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.wav"
-            sf.write(filename, audio, fs)
+            filename = f"data/{st.session_state.current_user}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.flac"
+            sf.write(filename, audio, fs, format='FLAC', subtype='PCM_16')
             
-            # Simpan hasil (simulasi)
-            result = {
-                'is_urgent': np.random.rand() > 0.5,
-                'confidence': round(np.random.uniform(0.7, 0.95), 2),
+            # Riwayat tidak diubah di sini; deteksi baru datang lewat LiveFeed
+            st.session_state.result = {
+                'is_urgent': bool(response.get('is_urgent')),
+                'confidence': response.get('confidence') or 0.0,
+                'status': response.get('status', 'success'),
+                'fold_spread': response.get('fold_spread'),
                 'time': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                 'file': filename
             }
             
-            # Update state dan history
-            st.session_state.result = result
-            USERS_DB[st.session_state.current_user]["history"].append({
-                'time': result['time'],
-                'status': 'DARURAT' if result['is_urgent'] else 'AMAN',
-                'confidence': int(result['confidence']*100),
-                'file': filename
-            })
-            
     except Exception as e:
         st.error(f"Gagal merekam: {str(e)}")
 
 # Tampilan Admin
 def admin_interface():
     st.title("📊 DASHBOARD ADMIN")
-    
-    # Statistik Real-time
+    show_admin_dashboard()
+
+# Monitor diperbarui dari LiveFeed, statistik dari /stats dengan cache STATS_TTL
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+def show_admin_dashboard():
+    feed = get_admin_feed()
+    feed.ensure_connected()
+    if feed.error:
+        st.warning(f"Update live tidak aktif: {feed.error}")
+    # Monitor hanya kasus darurat, sama dengan query awal /urgent_cases
+    detections = live_detections('admin:detections', feed, fetch_urgent_cases, lambda event: event['is_urgent'])
+
+    # Statistik 24 jam diambil ulang dari /stats agar jendela ikut bergeser;
+    # nilai terakhir dipakai jika backend sedang tidak bisa dihubungi
+    try:
+        st.session_state['admin:stats'] = fetch_stats(24)
+    except Exception as e:
+        st.warning(f"Gagal memuat statistik: {e}")
+    stats = st.session_state.get('admin:stats', {'total_detections': 0, 'urgent_cases': 0, 'normal_cases': 0})
+
     cols = st.columns(3)
-    cols[0].metric("Total Pengguna", len(USERS_DB))
-    cols[1].metric("Aktivitas Hari Ini", sum(1 for u in USERS_DB if USERS_DB[u]['history']))
-    cols[2].metric("Respon Rata-rata", "1.2s")
+    cols[0].metric("Deteksi 24 Jam", stats['total_detections'])
+    cols[1].metric("Kasus Darurat", stats['urgent_cases'])
+    cols[2].metric("Pengguna Darurat", len({d['user_id'] for d in detections['items'].values()}))
     
     # Visualisasi Data
     tab1, tab2 = st.tabs(["Statistik", "Monitor"])
     with tab1:
-        hist_data = pd.DataFrame({
-            "Waktu": [h['time'] for h in USERS_DB['user1']['history']],
-            "Status": [h['status'] for h in USERS_DB['user1']['history']]
-        })
-        st.bar_chart(hist_data['Status'].value_counts())
+        st.bar_chart(pd.Series({'DARURAT': stats['urgent_cases'], 'AMAN': stats['normal_cases']}, name='Jumlah'))
     
     with tab2:
-        for user in USERS_DB:
-            if user != 'admin':
-                with st.expander(f"Pengguna: {user}"):
-                    for h in USERS_DB[user]['history'][-3:]:
-                        st.write(f"{h['time']} - {h['status']} ({h['confidence']}%)")
+        by_user = {}
+        for detection in latest(detections['items'], len(detections['items'])):
+            by_user.setdefault(detection['user_id'], []).append(detection)
+        for user, items in by_user.items():
+            with st.expander(f"Pengguna: {user}"):
+                for h in items[:3]:
+                    st.write(f"{h['time']:%Y-%m-%d %H:%M:%S} - {'DARURAT' if h['is_urgent'] else 'AMAN'} ({h['confidence']*100:.0f}%)")
 
 # Main App
 def main():
@@ -0,0 +1,163 @@
+import io
+import os
+import threading
+import time
+
+import mongomock
+import numpy as np
+import pytest
+import soundfile as sf
+
+# Konfigurasi dibaca saat import app: model TFLite (cepat dimuat), tanpa arsip audio
+os.environ.setdefault('MODEL_BACKEND', 'tflite')
+os.environ.setdefault('PERSIST_AUDIO', '0')
+
+import app as app_module
+import registry
+from database import MongoDB
+
+FOLD_SCORES = np.array([[0.9, 0.1], [0.7, 0.3], [0.8, 0.2]], dtype=np.float32)
+
+
+def init_app():
+    app_module.init_services(MongoDB(client=mongomock.MongoClient(), write_mode='sync'))
+
+
+@pytest.fixture(scope='module')
+def client():
+    init_app()
+    assert app_module.ready_event.wait(timeout=300), app_module.startup_state
+    return app_module.app.test_client()
+
+
+def wav_upload(seconds=2, freq=440.0, sr=16000):
+    t = np.arange(int(seconds * sr)) / sr
+    buffer = io.BytesIO()
+    sf.write(buffer, (0.3 * np.sin(2 * np.pi * freq * t)).astype(np.float32), sr, format='WAV', subtype='PCM_16')
+    return buffer.getvalue()
+
+
+def post_audio(client, data, user_id='tester'):
+    return client.post('/process_audio', data={
+        'audio': (io.BytesIO(data), 'clip.wav'),
+        'user_id': user_id
+    }, content_type='multipart/form-data')
+
+
+def test_ready_reports_startup_until_model_is_loaded(monkeypatch):
+    # Test pertama di modul ini: layanan app belum diinisialisasi
+    assert app_module.db is None
+    probe = app_module.app.test_client()
+    response = probe.get('/ready')
+    assert response.status_code == 503
+    assert response.get_json()['stage'] == 'starting'
+
+    # Pemuatan model ditahan agar fase loading_model bisa diamati
+    release = threading.Event()
+    load_backend = registry.load_backend
+
+    def held_load_backend(*args, **kwargs):
+        release.wait(timeout=60)
+        return load_backend(*args, **kwargs)
+
+    monkeypatch.setattr(registry, 'load_backend', held_load_backend)
+    init_app()
+    deadline = time.monotonic() + 30
+    while app_module.startup_state['stage'] != 'loading_model' and time.monotonic() < deadline:
+        time.sleep(0.01)
+    body = probe.get('/ready').get_json()
+    assert body == {'ready': False, 'stage': 'loading_model', 'model_version': None, 'time_to_ready_s': None}
+    assert probe.post('/process_audio').status_code == 503
+
+    release.set()
+    assert app_module.ready_event.wait(timeout=300)
+    response = probe.get('/ready')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['stage'] == 'ready'
+    assert body['model_version'] == 'tflite:lstm_model_fold_4.tflite'
+    assert body['time_to_ready_s'] > 0
+
+
+class FoldBackend:
+    # Backend ensemble palsu: setiap sampel dinilai oleh tiga fold
+    name = 'ensemble'
+
+    def __init__(self, kind, path, **kwargs):
+        self.model_path = path
+
+    def predict(self, batch):
+        return np.tile(FOLD_SCORES, (len(batch), 1, 1))
+
+
+def test_ensemble_response_includes_fold_spread(client, monkeypatch):
+    previous = app_module.registry.active.version
+    monkeypatch.setattr(registry, 'load_backend', FoldBackend)
+    app_module.registry.activate('ensemble:models', background=False)
+    try:
+        body = post_audio(client, wav_upload()).get_json()
+        assert body['is_urgent'] is True
+        assert body['confidence'] == pytest.approx(0.8)
+        assert body['fold_spread']['fold_std'] == pytest.approx(np.std(FOLD_SCORES[:, 0]))
+        assert body['fold_spread']['fold_min'] == pytest.approx(0.7)
+        assert body['fold_spread']['fold_max'] == pytest.approx(0.9)
+        record = app_module.db.records.find_one({'model_version': 'ensemble:models'})
+        assert record['fold_spread'] == body['fold_spread']
+    finally:
+        monkeypatch.undo()
+        app_module.registry.activate(previous, background=False)
+
+
+def test_cache_hit_still_records_detection(client, monkeypatch):
+    published = []
+    monkeypatch.setattr(app_module.notifier, 'publish', published.append)
+    data = wav_upload(freq=523.0)
+    first = post_audio(client, data, user_id='cache-user').get_json()
+    second = post_audio(client, data, user_id='cache-user').get_json()
+    assert first['cached'] is False
+    assert second['cached'] is True
+    assert second['confidence'] == first['confidence']
+    # Hit cache hanya melewati inferensi; record dan notifikasi tetap dibuat
+    assert app_module.db.records.count_documents({'user_id': 'cache-user'}) == 2
+    assert [record['user_id'] for record in published] == ['cache-user', 'cache-user']
+
+
+def test_model_swap_clears_result_cache(client):
+    data = wav_upload(freq=659.0)
+    post_audio(client, data)
+    assert post_audio(client, data).get_json()['cached'] is True
+    # Versi yang sama dimuat ulang: kunci cache tetap sama, jadi hanya
+    # on_model_swap yang mencegah hasil lama dipakai lagi
+    app_module.registry.activate(app_module.registry.active.version, background=False)
+    assert app_module.result_cache.stats()['size'] == 0
+    assert post_audio(client, data).get_json()['cached'] is False
+
+
+def test_metrics_endpoint_exposes_metric_families(client):
+    assert post_audio(client, wav_upload()).status_code == 200
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+    types = dict(line.split(' ')[2:4] for line in text.splitlines() if line.startswith('# TYPE '))
+    assert types['process_audio_stage_seconds'] == 'histogram'
+    assert types['process_audio_requests_total'] == 'counter'
+    assert types['model_info'] == 'gauge'
+    assert types['inference_batches_total'] == 'counter'
+    assert types['result_cache_lookups_total'] == 'counter'
+    assert types['detection_notifications_total'] == 'counter'
+    assert 'process_audio_stage_seconds_count{stage="predict"}' in text
+    assert f'model_info{{version="{app_module.registry.active.version}",backend="tflite"}} 1' in text
+
+
+def test_stats_rejects_invalid_hours(client):
+    for hours in ('abc', '0', '-5', 'nan', 'inf'):
+        response = client.get(f'/stats?hours={hours}')
+        assert response.status_code == 400, hours
+        assert 'Invalid hours parameter' in response.get_json()['error']
+    assert client.get('/urgent_cases?hours=-1').status_code == 400
+
+    body = client.get('/stats?hours=1').get_json()
+    assert body['source'] == 'memory'
+    assert body['time_window_hours'] == 1
+    assert client.get('/stats?hours=48').get_json()['source'] == 'rollup'
@@ -0,0 +1,82 @@
+import io
+
+import numpy as np
+import pytest
+import soundfile as sf
+import librosa
+
+import audio as audio_module
+from audio import UnsupportedAudioError, decode_audio, encode_audio
+from features import extract_features
+from inference import load_backend
+
+SAMPLE_PATH = 'data/temp_default_user.wav'
+
+
+def load_sample():
+    audio, sr = sf.read(SAMPLE_PATH, dtype='float32')
+    return audio, sr
+
+
+def test_flac_upload_gives_identical_prediction():
+    audio, sr = load_sample()
+    wav, _, _ = encode_audio(audio, sr, 'wav')
+    flac, filename, mime = encode_audio(audio, sr, 'flac')
+    assert filename.endswith('.flac') and mime == 'audio/flac'
+
+    wav_audio, _ = decode_audio(wav)
+    flac_audio, _ = decode_audio(flac)
+    np.testing.assert_array_equal(wav_audio, flac_audio)
+
+    backend = load_backend('tflite')
+    np.testing.assert_array_equal(
+        backend.predict(extract_features(wav_audio, sr)),
+        backend.predict(extract_features(flac_audio, sr))
+    )
+    assert len(flac) < len(wav) / 2
+
+
+def test_opus_upload_decodes_at_16k():
+    audio, sr = load_sample()
+    wav, _, _ = encode_audio(audio, sr, 'wav')
+    opus, filename, _ = encode_audio(audio, sr, 'opus')
+    decoded, decoded_sr = decode_audio(opus)
+    assert filename.endswith('.ogg')
+    assert decoded_sr == 16000
+    assert abs(len(decoded) - len(audio)) <= 0.01 * sr
+    assert len(opus) < len(wav) / 5
+
+
+def test_corrupt_upload_is_rejected():
+    with pytest.raises(UnsupportedAudioError):
+        decode_audio(b'not audio at all')
+
+
+def test_fast_path_keeps_mfcc_unchanged(monkeypatch):
+    audio, sr = load_sample()
+    wav, _, _ = encode_audio(audio, sr, 'wav')
+    stereo = io.BytesIO()
+    sf.write(stereo, np.stack([audio, audio * 0.5], axis=1), sr, format='WAV', subtype='FLOAT')
+
+    # Referensi: loader generik librosa dan down-mix dari array (frames, channels)
+    expected_mono, _ = librosa.load(io.BytesIO(wav), sr=16000)
+    frames, _ = sf.read(io.BytesIO(stereo.getvalue()), dtype='float32')
+    expected_stereo = np.mean(frames, axis=1, dtype=np.float32)
+
+    # Audio 16 kHz tidak boleh melewati resampler
+    monkeypatch.setattr(audio_module, 'resample', lambda *args, **kwargs: pytest.fail('resampled a 16 kHz upload'))
+    monkeypatch.setattr(audio_module, 'DOWNMIX_BLOCK_FRAMES', 1000)
+    for data, expected in ((wav, expected_mono), (stereo.getvalue(), expected_stereo)):
+        decoded, decoded_sr = decode_audio(data)
+        assert decoded_sr == 16000
+        np.testing.assert_array_equal(extract_features(decoded, decoded_sr), extract_features(expected, 16000))
+
+
+def test_default_resampler_keeps_mfcc_close_to_librosa():
+    audio, _ = load_sample()
+    upsampled = librosa.resample(audio, orig_sr=16000, target_sr=44100)
+    data, _, _ = encode_audio(np.stack([upsampled, upsampled], axis=1), 44100, 'wav')
+    expected = extract_features(librosa.load(io.BytesIO(data), sr=16000)[0], 16000)
+    decoded, _ = decode_audio(data)
+    features = extract_features(decoded, 16000)
+    assert np.abs(features - expected).max() < 0.005 * np.abs(expected).max()
@@ -0,0 +1,30 @@
+import time
+
+import numpy as np
+
+from cache import ResultCache
+
+
+def test_key_depends_on_audio_and_model_version():
+    audio = np.zeros(16000, dtype=np.float32)
+    other = audio.copy()
+    other[0] = 0.5
+    assert ResultCache.key(audio, 'keras:a.h5') == ResultCache.key(audio.copy(), 'keras:a.h5')
+    assert ResultCache.key(audio, 'keras:a.h5') != ResultCache.key(other, 'keras:a.h5')
+    assert ResultCache.key(audio, 'keras:a.h5') != ResultCache.key(audio, 'keras:b.h5')
+
+
+def test_lru_and_ttl_eviction():
+    cache = ResultCache(max_size=2, ttl=0.05)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    # 'b' paling lama tidak dipakai sehingga dibuang
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+    time.sleep(0.06)
+    assert cache.get('a') is None
+    stats = cache.stats()
+    assert stats['hits'] == 2
+    assert stats['misses'] == 2
@@ -1,9 +1,19 @@
-from database import MongoDB
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
+
+import mongomock
+import pytest
+from bson import ObjectId
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from database import MongoDB, WriteBehindBuffer, MINUTE_ROLLUP_TTL_SECONDS, RECORD_INDEXES
+from metrics import RollingWindowCounter
 
 def test_connection():
     try:
-        db = MongoDB()
+        # Timeout pendek agar test tidak menunggu lama saat MongoDB tidak berjalan
+        db = MongoDB(client=MongoClient('mongodb://localhost:27017/', serverSelectionTimeoutMS=500))
         print("MongoDB connection successful!")
         
         # Test insert
@@ -19,5 +29,245 @@ def test_connection():
     except Exception as e:
         print(f"Error: {e}")
 
+class FlakyCollection:
+    # Stand-in koleksi yang gagal pada beberapa insert_many pertama
+    def __init__(self, collection, failures):
+        self.collection = collection
+        self.failures = failures
+
+    def insert_many(self, records, ordered=True):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError('mongo unavailable')
+        return self.collection.insert_many(records, ordered=ordered)
+
+
+def make_record(i, is_urgent=False):
+    return {
+        'user_id': f'user_{i % 3}',
+        'timestamp': datetime.now(),
+        'is_urgent': is_urgent,
+        'confidence': 0.5
+    }
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_sync_mode_inserts_immediately():
+    db = MongoDB(client=mongomock.MongoClient())
+    inserted_id = db.save_record(make_record(0))
+    assert db.records.count_documents({'_id': inserted_id}) == 1
+
+
+def test_write_behind_flushes_on_batch_size():
+    db = MongoDB(client=mongomock.MongoClient(), write_mode='write_behind',
+                 max_batch=5, flush_interval=60)
+    ids = [db.save_record(make_record(i)) for i in range(5)]
+    assert wait_for(lambda: db.records.count_documents({}) == 5)
+    assert db.records.count_documents({'_id': {'$in': ids}}) == 5
+    db.close_connection()
+
+
+def test_write_behind_flushes_on_interval():
+    db = MongoDB(client=mongomock.MongoClient(), write_mode='write_behind',
+                 max_batch=100, flush_interval=0.05)
+    db.save_record(make_record(0))
+    assert wait_for(lambda: db.records.count_documents({}) == 1)
+    db.close_connection()
+
+
+def test_write_behind_retries_failed_flush():
+    collection = mongomock.MongoClient()['emergency_db']['audio_records']
+    buffer = WriteBehindBuffer(FlakyCollection(collection, failures=2),
+                               max_batch=10, flush_interval=0.01, retry_backoff=0.01)
+    for i in range(3):
+        buffer.add(make_record(i))
+    assert wait_for(lambda: collection.count_documents({}) == 3)
+    assert buffer.stats['failed_flushes'] == 2
+    buffer.close()
+
+
+def test_write_behind_is_bounded():
+    collection = mongomock.MongoClient()['emergency_db']['audio_records']
+    buffer = WriteBehindBuffer(FlakyCollection(collection, failures=10 ** 6),
+                               max_batch=100, flush_interval=60, max_pending=3)
+    for i in range(5):
+        buffer.add(make_record(i))
+    assert buffer.pending() == 3
+    assert buffer.stats['dropped'] == 2
+
+
+def test_close_flushes_pending_records():
+    db = MongoDB(client=mongomock.MongoClient(), write_mode='write_behind',
+                 max_batch=100, flush_interval=60)
+    for i in range(7):
+        db.save_record(make_record(i))
+    db.writer.close()
+    assert db.records.count_documents({}) == 7
+
+
+def test_indexes_created_at_startup():
+    db = MongoDB(client=mongomock.MongoClient())
+    index_names = set(db.records.index_information())
+    assert {name for _, name in RECORD_INDEXES} <= index_names
+
+
+def test_statistics_from_rollups():
+    db = MongoDB(client=mongomock.MongoClient())
+    for i in range(6):
+        db.save_record(make_record(i, is_urgent=i % 3 == 0))
+    stats = db.get_statistics()
+    assert stats['total_detections'] == 6
+    assert stats['urgent_cases'] == 2
+    assert stats['normal_cases'] == 4
+
+
+def test_write_behind_updates_rollups():
+    db = MongoDB(client=mongomock.MongoClient(), write_mode='write_behind',
+                 max_batch=4, flush_interval=60)
+    for i in range(8):
+        db.save_record(make_record(i, is_urgent=i % 4 == 0))
+    assert wait_for(lambda: db.records.count_documents({}) == 8)
+    db.close_connection()
+    for resolution in ('minute', 'hour'):
+        buckets = list(db.rollups[resolution].find())
+        assert sum(b['total'] for b in buckets) == 8
+        assert sum(b['urgent'] for b in buckets) == 2
+    stats = db.get_statistics()
+    assert stats['total_detections'] == 8
+    assert stats['mean_confidence'] == pytest.approx(0.5)
+
+
+def test_statistics_combine_hour_and_minute_buckets():
+    db = MongoDB(client=mongomock.MongoClient())
+    now = datetime.now()
+    offsets = [timedelta(hours=49), timedelta(hours=47, minutes=30), timedelta(hours=2), timedelta(0)]
+    for i, offset in enumerate(offsets):
+        record = make_record(i, is_urgent=True)
+        record['timestamp'] = now - offset
+        db.save_record(record)
+    stats = db.get_statistics(48)
+    assert stats['total_detections'] == 3
+    assert stats['urgent_cases'] == 3
+    # Rollup bisa dibangun ulang dari record mentah dengan hasil yang sama
+    db.rollups['minute'].delete_many({})
+    db.rollups['hour'].delete_many({})
+    db.rebuild_rollups()
+    assert db.get_statistics(48) == stats
+
+
+def test_statistics_beyond_minute_rollup_ttl():
+    db = MongoDB(client=mongomock.MongoClient())
+    now = datetime.now()
+    hours = MINUTE_ROLLUP_TTL_SECONDS // 3600 + 24
+    for i, offset in enumerate([timedelta(hours=hours) - timedelta(minutes=5), timedelta(hours=1)]):
+        record = make_record(i, is_urgent=True)
+        record['timestamp'] = now - offset
+        db.save_record(record)
+    # Simulasi TTL: bucket per menit yang lebih tua dari TTL sudah dihapus
+    db.rollups['minute'].delete_many({'bucket': {'$lt': now - timedelta(seconds=MINUTE_ROLLUP_TTL_SECONDS)}})
+    # Tepi awal jendela dibaca dari bucket jam, bukan dari bucket menit yang hilang
+    assert db.get_statistics(hours)['total_detections'] == 2
+
+
+def test_rolling_window_counter():
+    counter = RollingWindowCounter(window_seconds=3600, slot_seconds=60)
+    now = 1_000_000.0
+    counter.add(True, 0.9, timestamp=now - 7200)
+    counter.add(True, 0.8, timestamp=now - 1800)
+    counter.add(False, 0.2, timestamp=now)
+    counter.seed(now - 120, {'total': 2, 'urgent': 1, 'confidence_sum': 1.0, 'confidence_count': 2})
+    totals = counter.totals(now=now)
+    assert totals['total'] == 4
+    assert totals['urgent'] == 2
+    assert totals['confidence_sum'] == pytest.approx(2.0)
+    assert counter.totals(600, now=now)['total'] == 3
+
+
+def test_history_projection():
+    db = MongoDB(client=mongomock.MongoClient())
+    record = make_record(0)
+    record['debug_payload'] = 'x' * 100
+    db.save_record(record)
+    history = db.get_user_history('user_0')
+    assert 'debug_payload' not in history[0]
+    assert history[0]['confidence'] == 0.5
+
+
+def test_keyset_pages_without_duplicates_or_gaps():
+    db = MongoDB(client=mongomock.MongoClient())
+    base = datetime(2024, 1, 1, 12, 0, 0)
+    # Banyak record berbagi timestamp yang sama: urutan ditentukan oleh _id
+    for i in range(23):
+        record = make_record(0, is_urgent=i % 2 == 0)
+        record['timestamp'] = base - timedelta(seconds=i // 5)
+        db.save_record(record)
+
+    seen, before, pages = [], None, 0
+    while True:
+        page = db.get_user_history('user_0', limit=5, before=before)
+        if not page:
+            break
+        seen += page
+        pages += 1
+        last = page[-1]
+        # Cursor bolak-balik lewat bentuk teksnya seperti di API
+        before = (datetime.fromisoformat(last['timestamp'].isoformat()), ObjectId(str(last['_id'])))
+
+    assert pages == 5
+    assert len({r['_id'] for r in seen}) == len(seen) == 23
+    keys = [(r['timestamp'], r['_id']) for r in seen]
+    assert keys == sorted(keys, reverse=True)
+
+
+def winning_stages(plan):
+    # Kumpulkan nama stage dari winningPlan (termasuk inputStage/inputStages bertingkat)
+    stages = []
+    pending = [plan]
+    while pending:
+        plan = pending.pop()
+        if not plan:
+            continue
+        stages.append(plan.get('stage'))
+        pending += [plan.get('inputStage'), plan.get('queryPlan')] + plan.get('inputStages', [])
+    return stages
+
+
+def test_queries_use_indexes_explain():
+    client = MongoClient('mongodb://localhost:27017/', serverSelectionTimeoutMS=500)
+    try:
+        client.admin.command('ping')
+    except PyMongoError:
+        pytest.skip('MongoDB is not available')
+
+    db = MongoDB(db_name='emergency_db_test', client=client)
+    try:
+        db.records.insert_many([make_record(i, is_urgent=i % 2 == 0) for i in range(50)])
+        last = db.get_user_history('user_0', limit=5)[-1]
+        before = (last['timestamp'], last['_id'])
+        # Cursor yang benar-benar dipakai endpoint, termasuk halaman lanjutan (keyset)
+        queries = [
+            db.iter_user_history('user_0', limit=5),
+            db.iter_user_history('user_0', limit=5, before=before),
+            db.iter_urgent(hours=24, limit=5),
+            db.iter_urgent(hours=24, limit=5, before=before)
+        ]
+        for cursor in queries:
+            plan = cursor.explain()['queryPlanner']['winningPlan']
+            stages = winning_stages(plan)
+            assert 'IXSCAN' in stages, stages
+            assert 'COLLSCAN' not in stages, stages
+            assert 'SORT' not in stages, stages
+    finally:
+        client.drop_database('emergency_db_test')
+
+
 if __name__ == "__main__":
     test_connection()
\ No newline at end of file
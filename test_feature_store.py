@@ -0,0 +1,63 @@
+import numpy as np
+from bson import ObjectId
+
+from feature_store import FeatureStore, rescore
+
+
+def make_rows(n, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, 94, 13)).astype(np.float32)
+
+
+def test_append_reopen_and_zero_copy_reads(tmp_path):
+    rows = make_rows(10)
+    ids = [ObjectId() for _ in rows]
+    store = FeatureStore(str(tmp_path), grow_rows=4)
+    for record_id, row in zip(ids, rows):
+        store.append(record_id, row)
+    assert store.count == 10 and store.capacity >= 10
+    store.close()
+
+    reader = FeatureStore(str(tmp_path), mode='r')
+    assert reader.count == 10
+    assert reader.ids() == ids
+    batch = reader.read(2, 6)
+    assert isinstance(batch, np.memmap)
+    np.testing.assert_array_equal(batch, rows[2:6])
+    np.testing.assert_array_equal(reader.get(ids[7]), rows[7])
+    assert reader.get(ObjectId()) is None
+
+
+def test_partial_tail_is_ignored_after_crash(tmp_path):
+    store = FeatureStore(str(tmp_path))
+    first = ObjectId()
+    store.append(first, make_rows(1)[0])
+    store.close()
+    # Id yang hanya tertulis sebagian dianggap belum ter-commit
+    with open(tmp_path / 'ids.bin', 'ab') as f:
+        f.write(b'\x01\x02\x03')
+
+    store = FeatureStore(str(tmp_path))
+    assert store.count == 1
+    second = ObjectId()
+    store.append(second, make_rows(1, seed=1)[0])
+    assert store.ids() == [first, second]
+    store.close()
+
+
+def test_rescore_batches(tmp_path):
+    store = FeatureStore(str(tmp_path))
+    ids = [ObjectId() for _ in range(5)]
+    rows = make_rows(5)
+    for record_id, row in zip(ids, rows):
+        store.append(record_id, row)
+    batch_sizes = []
+
+    def predict(batch):
+        batch_sizes.append(len(batch))
+        urgent = (batch.mean(axis=(1, 2)) > 0).astype(np.float32)
+        return np.stack([urgent, 1 - urgent], axis=1)
+
+    results = list(rescore(store, predict, batch_size=2))
+    assert batch_sizes == [2, 2, 1]
+    assert [record_id for record_id, _, _ in results] == ids
+    assert [is_urgent for _, is_urgent, _ in results] == list(rows.mean(axis=(1, 2)) > 0)
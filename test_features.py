@@ -0,0 +1,80 @@
+import numpy as np
+import librosa
+
+from features import (
+    extract_features, extract_features_batch, extract_window_features,
+    features_from_log_mel, get_basis, length_groups, log_mel_frames, num_frames
+)
+
+
+def reference_features(audio_data, sr=16000):
+    # Implementasi per clip yang dipakai saat training
+    mfcc = librosa.feature.mfcc(y=audio_data, sr=sr, n_mfcc=13, n_fft=2048, hop_length=512)
+    mfcc = (mfcc - np.mean(mfcc)) / np.std(mfcc)
+    mfcc = mfcc.T
+    if mfcc.shape[0] < 94:
+        mfcc = np.pad(mfcc, ((0, 94 - mfcc.shape[0]), (0, 0)), mode='constant')
+    else:
+        mfcc = mfcc[:94, :]
+    return mfcc
+
+
+def make_clips():
+    rng = np.random.default_rng(0)
+    t = np.arange(16000 * 4) / 16000
+    tone = (0.3 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+    return [
+        (0.1 * rng.standard_normal(8000)).astype(np.float32),
+        (0.1 * rng.standard_normal(16000 * 5)).astype(np.float32),
+        tone + (0.01 * rng.standard_normal(len(tone))).astype(np.float32)
+    ]
+
+
+def test_batch_matches_per_clip_reference():
+    clips = make_clips()
+    features = extract_features_batch(clips)
+    assert features.shape == (len(clips), 94, 13)
+    for i, clip in enumerate(clips):
+        np.testing.assert_allclose(features[i], reference_features(clip), atol=1e-4)
+
+
+def test_mixed_lengths_are_grouped_without_changing_features():
+    # Satu rekaman 10 menit tidak boleh membuat clip pendek ikut di-pad
+    lengths = [16000 * 3, 16000 * 600, 16000 * 3 + 100, 16000 * 5]
+    groups = length_groups(lengths)
+    assert [1] in groups
+    assert all(max(lengths[i] for i in g) <= 1.25 * min(lengths[i] for i in g) for g in groups)
+
+    clips = make_clips() + [(0.1 * np.random.default_rng(1).standard_normal(16000 * 60)).astype(np.float32)]
+    features = extract_features_batch(clips)
+    for i, clip in enumerate(clips):
+        np.testing.assert_allclose(features[i], extract_features(clip)[0], atol=1e-5)
+
+
+def test_extract_features_single_clip():
+    clip = make_clips()[0]
+    features = extract_features(clip, 16000)
+    assert features.shape == (1, 94, 13)
+    # Clip 0.5 detik hanya punya 16 frame, sisanya padding nol
+    assert np.all(features[0, 16:] == 0)
+
+
+def test_window_features_cover_whole_recording():
+    rng = np.random.default_rng(1)
+    audio = (0.1 * rng.standard_normal(16000 * 20)).astype(np.float32)
+    features, starts = extract_window_features(audio, 16000)
+    n_frames = num_frames(len(audio))
+    assert features.shape == (len(starts), 94, 13)
+    assert starts[0] == 0 and starts[-1] == n_frames - 94
+    assert np.all(np.diff(starts) <= 47)
+
+    # Setiap jendela sama dengan fitur dari potongan log-mel yang bersesuaian
+    basis = get_basis(16000)
+    log_mel = log_mel_frames(np.pad(audio, basis['n_fft'] // 2)[None], n_frames, basis)[0]
+    for i in (0, len(starts) // 2, len(starts) - 1):
+        expected = features_from_log_mel(log_mel[starts[i]:starts[i] + 94], basis)
+        np.testing.assert_allclose(features[i], expected, atol=1e-5)
+
+    # Clip pendek tetap satu jendela, identik dengan extract_features
+    short = audio[:16000 * 2]
+    np.testing.assert_allclose(extract_window_features(short, 16000)[0], extract_features(short, 16000))
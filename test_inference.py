@@ -0,0 +1,137 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from features import MAX_LENGTH, N_MFCC
+from inference import BatchScheduler, find_fold_models, interpret_prediction, load_backend, prediction_spread
+
+
+def test_tflite_interpreters_are_bounded_and_reused():
+    backend = load_backend('tflite', pool_size=2)
+    batch = np.random.default_rng(0).standard_normal((3, MAX_LENGTH, N_MFCC)).astype(np.float32)
+    expected = backend.predict(batch)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(backend.predict(batch))) for _ in range(50)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Setiap thread baru meminjam interpreter dari pool, bukan membuat sendiri
+    assert len(results) == 50
+    for result in results:
+        np.testing.assert_array_equal(result, expected)
+    assert backend.pool_size == 2
+    assert backend.available() == 2
+
+
+class RecordingPredict:
+    # predict_fn palsu: mencatat ukuran batch dan thread, bisa ditahan
+    def __init__(self):
+        self.batches = []
+        self.threads = []
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, batch):
+        self.entered.set()
+        self.release.wait(timeout=5)
+        self.batches.append(len(batch))
+        self.threads.append(threading.current_thread().name)
+        return batch[:, 0, :2] * 2
+
+
+def sample(value):
+    return np.full((1, MAX_LENGTH, N_MFCC), value, dtype=np.float32)
+
+
+def test_scheduler_coalesces_concurrent_requests():
+    predict = RecordingPredict()
+    scheduler = BatchScheduler(predict, max_batch_size=4, max_wait_ms=50)
+    try:
+        # Batch pertama ditahan agar request berikutnya menumpuk di antrian
+        predict.release.clear()
+        first = scheduler.submit(sample(0))
+        assert predict.entered.wait(timeout=5)
+        futures = [scheduler.submit(sample(i)) for i in range(1, 11)]
+        predict.release.set()
+
+        assert first.result(timeout=5)[0] == 0
+        # Setiap request menerima baris hasilnya sendiri
+        assert [f.result(timeout=5)[0] for f in futures] == [2.0 * i for i in range(1, 11)]
+        assert predict.batches == [1, 4, 4, 2]
+        stats = scheduler.stats()
+        assert stats['batches_total'] == 4
+        assert stats['items_total'] == 11
+        assert stats['batch_size_counts'] == {1: 1, 2: 1, 4: 2}
+        assert stats['queue_wait_seconds_max'] > 0
+    finally:
+        scheduler.close()
+
+
+def test_scheduler_flushes_partial_batch_after_max_wait():
+    predict = RecordingPredict()
+    scheduler = BatchScheduler(predict, max_batch_size=16, max_wait_ms=20)
+    try:
+        started = time.monotonic()
+        assert scheduler.predict(sample(3), timeout=5)[0] == 6.0
+        elapsed = time.monotonic() - started
+        # Satu request tidak menunggu batch penuh, hanya sekitar max_wait
+        assert predict.batches == [1]
+        assert 0.015 <= elapsed < 1.0
+    finally:
+        scheduler.close()
+
+
+def test_scheduler_runs_inline_after_close():
+    predict = RecordingPredict()
+    scheduler = BatchScheduler(predict, max_batch_size=4, max_wait_ms=1)
+    scheduler.close()
+    scheduler.close()
+    assert scheduler.predict(sample(1), timeout=5)[0] == 2.0
+    assert [f.result(timeout=5)[0] for f in scheduler.submit_many(np.concatenate([sample(2)] * 6))] == [4.0] * 6
+    # Setelah close tidak ada thread scheduler: batch dijalankan di thread pemanggil
+    assert set(predict.threads) == {threading.current_thread().name}
+    assert predict.batches == [1, 4, 2]
+    assert scheduler.stats()['items_total'] == 7
+
+
+def test_interpret_prediction_averages_folds():
+    # (n_folds, n_classes): confidence darurat adalah rata-rata kolom darurat
+    prediction = np.array([[0.9, 0.1], [0.6, 0.4], [0.3, 0.7]], dtype=np.float32)
+    is_urgent, confidence = interpret_prediction(prediction)
+    assert is_urgent
+    assert confidence == pytest.approx(0.6)
+    assert interpret_prediction(prediction[[1, 2]]) == (False, pytest.approx(0.45))
+    assert interpret_prediction(np.array([0.8, 0.2])) == (True, pytest.approx(0.8))
+
+
+def test_prediction_spread_only_for_ensemble_rows():
+    prediction = np.array([[0.9, 0.1], [0.6, 0.4], [0.3, 0.7]], dtype=np.float32)
+    spread = prediction_spread(prediction)
+    assert spread['fold_std'] == pytest.approx(np.std([0.9, 0.6, 0.3]))
+    assert spread['fold_min'] == pytest.approx(0.3)
+    assert spread['fold_max'] == pytest.approx(0.9)
+    assert prediction_spread(prediction[0]) is None
+
+
+def test_ensemble_matches_separate_fold_models():
+    import tensorflow as tf
+    backend = load_backend('ensemble', 'models')
+    batch = np.random.default_rng(0).standard_normal((4, MAX_LENGTH, N_MFCC)).astype(np.float32)
+    # Graph gabungan dipanggil langsung: predict_on_batch pertama mengompilasi
+    # 10 LSTM (~45 detik di 1 core); yang diuji di sini adalah graph gabungannya
+    fused = np.asarray(backend.model(batch, training=False))
+    folds = find_fold_models('models')
+    assert fused.shape == (4, len(folds), 2)
+
+    separate = np.stack([
+        np.asarray(tf.keras.models.load_model(path, compile=False)(batch, training=False)) for _, path in folds
+    ], axis=1)
+    np.testing.assert_allclose(fused, separate, atol=1e-5)
+    for row, expected in zip(fused, separate):
+        assert interpret_prediction(row)[1] == pytest.approx(float(expected[:, 0].mean()), abs=1e-5)
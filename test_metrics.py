@@ -0,0 +1,103 @@
+import re
+
+import pytest
+
+from metrics import Gauge, Histogram, MetricsRegistry, RequestTimer
+
+SAMPLE_LINE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{.*\})? (\S+)$')
+LABEL_PAIR = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+UNESCAPE = {'\\\\': '\\', '\\"': '"', '\\n': '\n'}
+
+
+def parse_exposition(text):
+    """
+    Parser minimal format teks Prometheus: nama -> {'type', 'help', 'samples'}
+    dengan samples berisi (nama sample, label dict, nilai float)
+    """
+    assert text.endswith('\n')
+    families = {}
+    for line in text.splitlines():
+        if line.startswith('# HELP '):
+            name, help_text = line[len('# HELP '):].split(' ', 1)
+            families.setdefault(name, {'samples': []})['help'] = help_text
+        elif line.startswith('# TYPE '):
+            name, metric_type = line[len('# TYPE '):].split(' ')
+            families[name]['type'] = metric_type
+        else:
+            match = SAMPLE_LINE.match(line)
+            assert match, line
+            sample_name, labels, value = match.groups()
+            family = next(name for name in families if sample_name in (
+                name, f'{name}_bucket', f'{name}_sum', f'{name}_count'))
+            parsed = {key: re.sub(r'\\[\\"n]', lambda m: UNESCAPE[m.group(0)], raw)
+                      for key, raw in LABEL_PAIR.findall(labels or '')}
+            families[family]['samples'].append((sample_name, parsed, float(value)))
+    return families
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    histogram = registry.histogram('latency_seconds', 'Latency', ['stage'], buckets=(0.1, 0.5, 1.0))
+    for value in (0.05, 0.1, 0.3, 2.0):
+        histogram.observe(value, stage='decode')
+    histogram.observe(0.7, stage='predict')
+
+    family = parse_exposition(registry.render())['latency_seconds']
+    assert family['type'] == 'histogram'
+    decode = [(name, labels, value) for name, labels, value in family['samples'] if labels['stage'] == 'decode']
+    buckets = {labels['le']: value for name, labels, value in decode if name == 'latency_seconds_bucket'}
+    # Batas 'le' inklusif: 0.1 masuk bucket 0.1
+    assert buckets == {'0.1': 2, '0.5': 3, '1.0': 3, '+Inf': 4}
+    totals = {name: value for name, _, value in decode if name != 'latency_seconds_bucket'}
+    assert totals['latency_seconds_count'] == 4
+    assert totals['latency_seconds_sum'] == pytest.approx(2.45)
+
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    counter = registry.counter('uploads_total', 'Uploads', ['filename'])
+    tricky = 'say "hi"\\n\nnext line'
+    counter.inc(filename=tricky)
+    counter.inc(2, filename=tricky)
+
+    text = registry.render()
+    # Satu sample tetap satu baris meskipun label berisi newline
+    assert len(text.splitlines()) == 3
+    [(_, labels, value)] = parse_exposition(text)['uploads_total']['samples']
+    assert labels == {'filename': tricky}
+    assert value == 3
+
+
+def test_render_includes_collectors_and_timer_stages():
+    registry = MetricsRegistry()
+    requests = registry.counter('requests_total', 'Requests')
+    stages = registry.histogram('stage_seconds', 'Stage time', ['stage'])
+    requests.inc()
+
+    def collect():
+        depth = Gauge('queue_depth', 'Queue depth')
+        depth.set(3)
+        return [depth]
+
+    registry.register_collector(collect)
+    timer = RequestTimer(stages)
+    with timer.stage('decode'):
+        pass
+    assert set(timer.timings) == {'decode'}
+
+    families = parse_exposition(registry.render())
+    assert {name: family['type'] for name, family in families.items()} == {
+        'requests_total': 'counter',
+        'stage_seconds': 'histogram',
+        'queue_depth': 'gauge'
+    }
+    assert all(family['help'] for family in families.values())
+    assert families['queue_depth']['samples'] == [('queue_depth', {}, 3.0)]
+    assert ('stage_seconds_count', {'stage': 'decode'}, 1.0) in families['stage_seconds']['samples']
+
+
+def test_standalone_histogram_le_labels_sorted():
+    histogram = Histogram('size', 'Size', buckets=(10, 1, 5))
+    histogram.observe(4)
+    bounds = [labels for name, labels, _ in histogram.samples() if name == 'size_bucket']
+    assert bounds == ['{le="1"}', '{le="5"}', '{le="10"}', '{le="+Inf"}']
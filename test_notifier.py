@@ -0,0 +1,91 @@
+from datetime import datetime
+
+from bson import ObjectId
+from flask import Flask
+from flask_socketio import SocketIO, join_room
+
+from notifier import ADMIN_ROOM, DetectionNotifier, rooms_for, user_room, user_room_token
+
+
+def make_record(i, is_urgent=False, users=50):
+    return {
+        '_id': ObjectId(),
+        'user_id': f'user_{i % users}',
+        'timestamp': datetime.now(),
+        'is_urgent': is_urgent,
+        'confidence': 0.9 if is_urgent else 0.1
+    }
+
+
+def test_rooms_require_configured_tokens():
+    token = user_room_token('secret', 'u1')
+    assert rooms_for({'user_id': 'u1', 'user_token': token}, user_secret='secret') == [user_room('u1')]
+    # Tanpa token yang benar, atau tanpa secret di server, room user tertutup
+    assert rooms_for({'user_id': 'u1', 'user_token': user_room_token('secret', 'u2')}, user_secret='secret') == []
+    assert rooms_for({'user_id': 'u1', 'user_token': token}) == []
+    # Room admin hanya dengan ADMIN_TOKEN yang dikonfigurasi dan cocok
+    assert rooms_for({}) == []
+    assert rooms_for({'role': 'admin', 'admin_token': 'x'}, admin_token='admin') == []
+    assert rooms_for({'admin_token': 'admin'}, admin_token='admin') == [ADMIN_ROOM]
+
+
+def test_urgent_immediate_and_normal_coalesced():
+    sent = []
+    notifier = DetectionNotifier(lambda event, data, to: sent.append((event, data, to)), batch_interval=60)
+    notifier.publish(make_record(0, is_urgent=True))
+    assert [(event, to) for event, _, to in sent] == [('new_detection', [ADMIN_ROOM, 'user:user_0'])]
+    # Payload siap JSON: tanpa ObjectId/datetime mentah
+    assert isinstance(sent[0][1]['id'], str) and isinstance(sent[0][1]['timestamp'], str)
+
+    for i in range(5):
+        notifier.publish(make_record(i, users=2))
+    assert len(sent) == 1 and notifier.pending() == 5
+    notifier.close()
+    batches = {tuple(to): data['detections'] for event, data, to in sent[1:] if event == 'detection_batch'}
+    assert len(batches[(ADMIN_ROOM,)]) == 5
+    assert len(batches[('user:user_0',)]) == 3
+    assert len(batches[('user:user_1',)]) == 2
+
+
+def test_fanout_load_hundreds_of_clients():
+    app = Flask(__name__)
+    socketio = SocketIO(app, async_mode='threading')
+
+    @socketio.on('connect')
+    def on_connect(auth=None):
+        for room in rooms_for(auth, admin_token='admin', user_secret='secret'):
+            join_room(room)
+
+    users = 50
+    admins = [socketio.test_client(app, auth={'admin_token': 'admin'}) for _ in range(50)]
+    clients = [socketio.test_client(app, auth={
+        'user_id': f'user_{i % users}',
+        'user_token': user_room_token('secret', f'user_{i % users}')
+    }) for i in range(250)]
+
+    emits = []
+
+    def emit(event, data, to):
+        emits.append(event)
+        socketio.emit(event, data, to=to)
+
+    notifier = DetectionNotifier(emit, batch_interval=0.05)
+    detections = 500
+    for i in range(detections):
+        notifier.publish(make_record(i, is_urgent=i % 10 == 0, users=users))
+    notifier.close()
+
+    def received(client):
+        ids = []
+        for message in client.get_received():
+            data = message['args'][0]
+            ids += [d['id'] for d in data['detections']] if message['name'] == 'detection_batch' else [data['id']]
+        return ids
+
+    for admin in admins:
+        assert len(set(received(admin))) == detections
+    for client in clients:
+        assert len(received(client)) == detections // users
+    # Satu emit per event darurat, batch normal jauh lebih sedikit dari jumlah penerima
+    assert emits.count('new_detection') == detections // 10
+    assert emits.count('detection_batch') < detections - detections // 10
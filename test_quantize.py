@@ -0,0 +1,39 @@
+import os
+
+import numpy as np
+
+from benchmark import synthetic_clip
+from features import extract_window_features
+from inference import TFLiteBackend, load_backend
+import quantize
+from quantize import convert, evaluate, quantize_model
+
+MODEL_PATH = 'models/lstm_model_fold_1.h5'
+
+
+def test_int8_model_runs_through_tflite_backend(tmp_path):
+    features = np.concatenate([extract_window_features(synthetic_clip(6, seed=i))[0] for i in range(4)])
+    output_path = tmp_path / 'fold_1_int8.tflite'
+    output_path.write_bytes(convert(MODEL_PATH, 'int8', features))
+
+    backend = TFLiteBackend(str(output_path))
+    assert backend.input_dtype == np.int8
+    predictions = backend.predict(features)
+    # Output didekuantisasi kembali menjadi probabilitas
+    assert predictions.dtype == np.float32
+    np.testing.assert_allclose(predictions.sum(axis=1), 1.0, atol=0.02)
+
+    report = evaluate(load_backend('keras', MODEL_PATH).predict(features), predictions, features)
+    assert report['confidence_mae'] < 0.05
+
+
+def test_failed_conversion_leaves_no_model_file(tmp_path, monkeypatch):
+    def failing_convert(model_path, mode, calibration):
+        raise ValueError('conversion failed')
+
+    monkeypatch.setattr(quantize, 'convert', failing_convert)
+    features = np.zeros((2, 94, 13), dtype=np.float32)
+    report = quantize_model(MODEL_PATH, features, features, str(tmp_path), modes=('dynamic',), repeats=1)
+    assert report['dynamic'] == {'error': 'conversion failed'}
+    # Tidak ada .tflite kosong maupun berkas sementara yang tertinggal
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,98 @@
+import threading
+
+import numpy as np
+import pytest
+
+import registry
+from registry import ModelRegistry
+
+
+class FakeBackend:
+    def __init__(self, kind, path):
+        self.name = kind
+        self.model_path = path
+        self.release = threading.Event()
+        self.release.set()
+
+    def predict(self, batch):
+        self.release.wait()
+        return np.tile([0.2, 0.8], (len(batch), 1)).astype(np.float32)
+
+
+def make_registry(tmp_path, monkeypatch, **kwargs):
+    for name in ('final_model.h5', 'lstm_model_fold_1.h5', 'lstm_model_fold_4.tflite', 'notes.txt'):
+        (tmp_path / name).write_bytes(b'')
+    monkeypatch.setattr(registry, 'load_backend', lambda kind, path, **_: FakeBackend(kind, path))
+    return ModelRegistry(str(tmp_path), **kwargs)
+
+
+def test_scan_lists_models_and_ensemble(tmp_path, monkeypatch):
+    models = make_registry(tmp_path, monkeypatch)
+    assert sorted(models.scan()) == [
+        f'ensemble:{tmp_path.name}',
+        'keras:final_model.h5',
+        'keras:lstm_model_fold_1.h5',
+        'tflite:lstm_model_fold_4.tflite'
+    ]
+
+
+def test_swap_lets_inflight_requests_finish_on_old_version(tmp_path, monkeypatch):
+    swaps = []
+    models = make_registry(tmp_path, monkeypatch, batch_max_wait_ms=1.0,
+                           on_swap=lambda new, old: swaps.append((new.version, old and old.version)))
+    models.activate('keras:final_model.h5', background=False)
+    old = models.active
+
+    # Request yang sedang berjalan menahan model lama
+    old.backend.release.clear()
+    features = np.zeros((1, 94, 13), dtype=np.float32)
+    inflight = old.scheduler.submit(features)
+
+    models.activate('tflite:lstm_model_fold_4.tflite').join(timeout=10)
+    assert models.active.version == 'tflite:lstm_model_fold_4.tflite'
+    assert swaps[-1] == ('tflite:lstm_model_fold_4.tflite', 'keras:final_model.h5')
+
+    old.backend.release.set()
+    assert inflight.result(timeout=5)[1] == np.float32(0.8)
+    # Scheduler lama sudah ditutup, tetapi request terlambat tetap dilayani
+    assert old.predict(features)[1] == np.float32(0.8)
+    models.active.close()
+
+
+def test_activate_rejects_unknown_and_concurrent_loads(tmp_path, monkeypatch):
+    models = make_registry(tmp_path, monkeypatch, batch_max_size=0)
+    with pytest.raises(KeyError):
+        models.activate('keras:missing.h5')
+    models._loading = 'keras:final_model.h5'
+    with pytest.raises(RuntimeError):
+        models.activate('keras:lstm_model_fold_1.h5')
+
+
+def test_long_audio_windows_go_through_scheduler(tmp_path, monkeypatch):
+    models = make_registry(tmp_path, monkeypatch, batch_max_size=16, batch_max_wait_ms=1.0)
+    models.activate('tflite:lstm_model_fold_4.tflite', background=False)
+    serving = models.active
+    before = serving.scheduler.stats()['items_total']
+
+    predictions = serving.predict_batch(np.zeros((40, 94, 13), dtype=np.float32))
+    assert predictions.shape == (40, 2)
+    stats = serving.scheduler.stats()
+    assert stats['items_total'] - before == 40
+    assert max(stats['batch_size_counts']) <= 16
+    serving.close()
+
+
+def test_swap_waits_for_acquired_requests_before_closing(tmp_path, monkeypatch):
+    models = make_registry(tmp_path, monkeypatch, batch_max_size=0)
+    models.activate('keras:final_model.h5', background=False)
+    closed = threading.Event()
+
+    with models.acquire() as serving:
+        serving.close = closed.set
+        loader = models.activate('tflite:lstm_model_fold_4.tflite')
+        # Swap selesai tetapi versi lama masih dipegang request ini
+        assert not closed.wait(0.5)
+        assert models.active.version == 'tflite:lstm_model_fold_4.tflite'
+        serving.predict(np.zeros((1, 94, 13), dtype=np.float32))
+    loader.join(timeout=5)
+    assert closed.is_set()
@@ -0,0 +1,55 @@
+import json
+
+import numpy as np
+import soundfile as sf
+
+import score_batch
+from score_batch import ResultWriter
+
+
+class FakeBackend:
+    # Backend pengganti yang mencatat jumlah baris yang diprediksi
+    name = 'fake'
+    model_path = 'fake.h5'
+
+    def __init__(self):
+        self.rows = 0
+
+    def predict(self, batch):
+        self.rows += len(batch)
+        return np.tile([0.8, 0.2], (len(batch), 1))
+
+
+def write_clips(directory, count, sr=16000):
+    paths = []
+    for i in range(count):
+        path = str(directory / f'clip_{i}.wav')
+        sf.write(path, 0.1 * np.sin(np.arange(sr) * (i + 1) / 50), sr)
+        paths.append(path)
+    return paths
+
+
+def test_resume_skips_rows_already_scored(tmp_path, monkeypatch):
+    clips = tmp_path / 'clips'
+    clips.mkdir()
+    paths = write_clips(clips, 4)
+    output = tmp_path / 'scores.jsonl'
+    # Dua file sudah dinilai, ditambah baris terakhir yang terpotong saat proses berhenti
+    with open(output, 'w') as f:
+        for path in paths[:2]:
+            f.write(json.dumps({'path': path, 'is_urgent': False}) + '\n')
+        f.write('{"path": "' + paths[2])
+
+    backend = FakeBackend()
+    monkeypatch.setattr(score_batch, 'load_backend', lambda kind, model_path=None: backend)
+    assert score_batch.run(str(clips), str(output), workers=1) == 2
+    assert backend.rows == 2
+
+    with open(output) as f:
+        rows = [json.loads(line) for line in f]
+    assert sorted(row['path'] for row in rows) == paths
+    assert all(row['is_urgent'] for row in rows[2:])
+    assert ResultWriter(str(output)).completed() == set(paths)
+    # Semua sudah tercatat: run berikutnya tidak menilai apa pun
+    assert score_batch.run(str(clips), str(output), workers=1) == 0
+    assert backend.rows == 2
@@ -0,0 +1,53 @@
+import numpy as np
+
+from features import MAX_LENGTH, features_from_log_mel, get_basis, log_mel_frames
+from streaming import StreamingClassifier
+
+SR = 16000
+
+
+def make_stream(seconds=12, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(seconds * SR) / SR
+    audio = 0.3 * np.sin(2 * np.pi * (200 + 50 * t) * t) + 0.05 * rng.standard_normal(len(t))
+    return audio.astype(np.float32)
+
+
+def offline_window(audio, total_frames):
+    # Referensi: log-mel seluruh stream (center=True di awal), ambil 94 frame terakhir
+    basis = get_basis(SR)
+    padded = np.concatenate([np.zeros(basis['n_fft'] // 2, dtype=np.float32), audio])
+    log_mel = log_mel_frames(padded, total_frames, basis)
+    return features_from_log_mel(log_mel[-MAX_LENGTH:], basis, MAX_LENGTH)
+
+
+def test_ring_buffer_wraparound_matches_offline_features():
+    audio = make_stream()
+    stream = StreamingClassifier(emit_every=10 ** 6, pcm_format='float32')
+    # Potongan dengan ukuran acak agar batas frame tidak sejajar dengan chunk
+    rng = np.random.default_rng(1)
+    position = 0
+    while position < len(audio):
+        size = int(rng.integers(100, 3000))
+        stream.push(audio[position:position + size])
+        position += size
+    # Ring buffer 94 frame sudah berputar berkali-kali
+    assert stream.total_frames > 3 * MAX_LENGTH
+    np.testing.assert_allclose(stream.window_features(), offline_window(audio, stream.total_frames), atol=1e-4)
+
+
+def test_emits_every_n_frames_and_int16_chunks():
+    audio = make_stream(seconds=4)
+    pcm = (audio * 32767).astype(np.int16)
+    stream = StreamingClassifier(emit_every=8)
+    hop = stream.hop
+    emitted_at = []
+    for start in range(0, len(pcm), hop):
+        features = stream.push(pcm[start:start + hop].tobytes())
+        if features is not None:
+            assert features.shape == (1, MAX_LENGTH, 13)
+            emitted_at.append(stream.total_frames)
+    # Satu frame baru per potongan hop: klasifikasi tepat setiap 8 frame
+    assert len(emitted_at) == stream.total_frames // 8
+    assert np.all(np.diff(emitted_at) == 8)
+    assert stream.stream_seconds == len(pcm) / SR
@@ -0,0 +1,41 @@
+import numpy as np
+
+from vad import VoiceActivityGate, gate_from_env
+
+SR = 16000
+
+
+def tone(seconds, amplitude=0.2, freq=300):
+    t = np.arange(int(seconds * SR)) / SR
+    return (amplitude * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+
+def test_silence_and_hiss_are_gated():
+    gate = VoiceActivityGate()
+    rng = np.random.default_rng(0)
+    assert gate.apply(np.zeros(3 * SR, dtype=np.float32), SR) is None
+    # Noise putih cukup keras tetapi ZCR-nya terlalu tinggi untuk suara
+    assert gate.apply((0.03 * rng.standard_normal(3 * SR)).astype(np.float32), SR) is None
+    # Suara yang lebih pendek dari min_speech_ms tetap dianggap tanpa suara
+    short = np.concatenate([np.zeros(SR, np.float32), tone(0.05), np.zeros(SR, np.float32)])
+    assert gate.apply(short, SR) is None
+
+
+def test_leading_and_trailing_silence_is_trimmed():
+    gate = VoiceActivityGate(pad_ms=100)
+    audio = np.concatenate([np.zeros(2 * SR, np.float32), tone(1.0), np.zeros(3 * SR, np.float32)])
+    start, end = gate.speech_bounds(audio, SR)
+    # Batas suara akurat sampai satu frame analisis (25 ms)
+    frame = SR // 40
+    assert abs(start - (2 * SR - SR // 10)) <= frame
+    assert abs(end - (3 * SR + SR // 10)) <= frame
+    trimmed = gate.apply(audio, SR)
+    assert np.shares_memory(trimmed, audio)
+    assert len(trimmed) == end - start
+
+
+def test_gate_from_env():
+    assert gate_from_env({'VAD_ENABLED': '0'}) is None
+    gate = gate_from_env({'VAD_ENERGY_DB': '-30', 'VAD_MIN_SPEECH_MS': '500'})
+    assert gate.energy_db == -30.0
+    assert gate.min_speech_ms == 500.0
@@ -0,0 +1,45 @@
+import io
+
+import numpy as np
+import soundfile as sf
+
+from inference import load_backend
+from features import extract_features
+from worker_pool import InferencePool
+
+MODEL_PATH = 'models/lstm_model_fold_4.tflite'
+# Runtime dipakai bersama lewat forkserver; tanpa itu setiap worker ~320 MB private
+WORKER_PRIVATE_MB_LIMIT = 200
+
+
+def make_clips(n, seconds=3, sr=16000):
+    rng = np.random.default_rng(0)
+    clips = []
+    for i in range(n):
+        t = np.arange(seconds * sr) / sr
+        clip = 0.2 * np.sin(2 * np.pi * (200 + 40 * i) * t) + 0.02 * rng.standard_normal(len(t))
+        buffer = io.BytesIO()
+        sf.write(buffer, clip.astype(np.float32), sr, format='WAV', subtype='PCM_16')
+        clips.append(buffer.getvalue())
+    return clips
+
+
+def test_pool_matches_in_process_backend():
+    clips = make_clips(4)
+    backend = load_backend('tflite', MODEL_PATH)
+    pool = InferencePool('tflite', MODEL_PATH, workers=2)
+    try:
+        assert len(pool.start()) == 2
+        memory = pool.memory()
+        assert len(memory) == 2
+        assert all(0 < m['private_mb'] < WORKER_PRIVATE_MB_LIMIT for m in memory.values())
+        assert all(m['private_mb'] <= m['rss_mb'] for m in memory.values())
+        for data in clips:
+            prediction, _, duration, _ = pool.classify_bytes(data)
+            audio, _ = sf.read(io.BytesIO(data), dtype='float32')
+            expected = backend.predict(extract_features(audio, 16000))[0]
+            np.testing.assert_allclose(prediction, expected, atol=1e-5)
+            assert duration == 3.0
+    finally:
+        pool.close()
+
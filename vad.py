@@ -0,0 +1,71 @@
+import numpy as np
+
+
+class VoiceActivityGate:
+    def __init__(self, energy_db=-45.0, zcr_max=0.35, min_speech_ms=120, pad_ms=150,
+                 frame_ms=25, hop_ms=10):
+        """
+        Deteksi aktivitas suara berbasis energi dan zero-crossing rate.
+        Frame dianggap suara jika energinya di atas `energy_db` (dBFS) dan
+        ZCR-nya tidak setinggi noise/desis (`zcr_max`, per sampel).
+        """
+        self.energy_db = energy_db
+        self.zcr_max = zcr_max
+        self.min_speech_ms = min_speech_ms
+        self.pad_ms = pad_ms
+        self.frame_ms = frame_ms
+        self.hop_ms = hop_ms
+
+    def voiced_frames(self, audio, sr):
+        """
+        Mask boolean per frame (hop `hop_ms`) untuk frame yang berisi suara
+        """
+        frame = int(sr * self.frame_ms / 1000)
+        hop = int(sr * self.hop_ms / 1000)
+        if len(audio) < frame:
+            audio = np.pad(audio, (0, frame - len(audio)))
+        frames = np.lib.stride_tricks.sliding_window_view(audio, frame)[::hop]
+        rms = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1))
+        energy_db = 20 * np.log10(rms + 1e-10)
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / frame
+        return (energy_db > self.energy_db) & (zcr <= self.zcr_max)
+
+    def speech_bounds(self, audio, sr):
+        """
+        (awal, akhir) sampel bagian bersuara termasuk padding, atau None
+        jika clip tidak berisi suara yang cukup panjang
+        """
+        voiced = self.voiced_frames(audio, sr)
+        hop = int(sr * self.hop_ms / 1000)
+        if np.count_nonzero(voiced) * self.hop_ms < self.min_speech_ms:
+            return None
+        indices = np.flatnonzero(voiced)
+        pad = int(sr * self.pad_ms / 1000)
+        start = max(0, indices[0] * hop - pad)
+        end = min(len(audio), indices[-1] * hop + int(sr * self.frame_ms / 1000) + pad)
+        return start, end
+
+    def apply(self, audio, sr):
+        """
+        Audio dengan hening di awal/akhir dipotong (view, tanpa salinan),
+        atau None jika clip tidak berisi suara
+        """
+        bounds = self.speech_bounds(audio, sr)
+        if bounds is None:
+            return None
+        return audio[bounds[0]:bounds[1]]
+
+
+def gate_from_env(environ):
+    """
+    VoiceActivityGate dari variabel lingkungan VAD_*; None jika VAD_ENABLED=0
+    """
+    if environ.get('VAD_ENABLED', '1') != '1':
+        return None
+    return VoiceActivityGate(
+        energy_db=float(environ.get('VAD_ENERGY_DB', -45)),
+        zcr_max=float(environ.get('VAD_ZCR_MAX', 0.35)),
+        min_speech_ms=float(environ.get('VAD_MIN_SPEECH_MS', 120)),
+        pad_ms=float(environ.get('VAD_PAD_MS', 150))
+    )
@@ -0,0 +1,210 @@
+import os
+import time
+import logging
+import multiprocessing
+from types import SimpleNamespace
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# State per proses worker, diisi oleh _init_worker
+_worker = {}
+
+# Dimuat sekali di proses forkserver; worker di-fork darinya sehingga runtime
+# TensorFlow/TFLite, numpy dan scipy dipakai bersama (copy-on-write), bukan
+# dimuat ulang di setiap worker
+PRELOAD_MODULES = ['worker_pool', 'inference', 'features', 'audio', 'vad', 'tensorflow']
+
+
+def pool_context():
+    """
+    Context multiprocessing untuk worker: forkserver dengan PRELOAD_MODULES
+    jika tersedia (Linux/macOS), selain itu spawn. Keduanya tidak mem-fork
+    proses server yang sudah berthread.
+    """
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload(PRELOAD_MODULES)
+    return context
+
+
+def _init_worker(kind, model_path, sr, vad, ready):
+    """
+    Dijalankan sekali di setiap proses worker: memuat model lalu warm-up.
+    Runtime sudah dimuat oleh forkserver; model .tflite dibaca lewat mmap
+    sehingga halaman bobotnya juga dipakai bersama lewat page cache.
+    """
+    os.environ["CUDA_VISIBLE_DEVICES"] = "-1"
+    from features import extract_features
+    from inference import load_backend
+    backend = load_backend(kind, model_path, num_threads=1, pool_size=1)
+    backend.predict(extract_features(np.zeros(sr, dtype=np.float32) + 1e-3, sr))
+    _worker.update(backend=backend, sr=sr, vad=vad)
+    ready.put(os.getpid())
+
+
+def _classify_bytes(data):
+    from audio import decode_audio
+    from features import extract_features
+    audio_data, sr = decode_audio(data, target_sr=_worker['sr'])
+    duration = len(audio_data) / sr
+    if _worker['vad'] is not None:
+        audio_data = _worker['vad'].apply(audio_data, sr)
+        if audio_data is None:
+            return None, None, duration, None
+    features = extract_features(audio_data, sr)
+    prediction = _worker['backend'].predict(features)[0]
+    return prediction, features, duration, len(audio_data) / sr
+
+
+def _score_windows(data):
+    from audio import decode_audio
+    from features import extract_window_features
+    audio_data, sr = decode_audio(data, target_sr=_worker['sr'])
+    duration = len(audio_data) / sr
+    if _worker['vad'] is not None and _worker['vad'].speech_bounds(audio_data, sr) is None:
+        return None, None, duration
+    features, starts = extract_window_features(audio_data, sr)
+    return _worker['backend'].predict(features), starts, duration
+
+
+def _predict(features):
+    return _worker['backend'].predict(features)
+
+
+def _ping():
+    return os.getpid()
+
+
+def process_memory_mb(pid):
+    """
+    Memori proses dari /proc/<pid>/smaps_rollup (Linux): rss, pss dan private
+    (halaman yang hanya dimiliki proses itu) dalam MB
+    """
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1]) / 1024.0
+    return {
+        'rss_mb': fields.get('Rss', 0.0),
+        'pss_mb': fields.get('Pss', 0.0),
+        'private_mb': fields.get('Private_Clean', 0.0) + fields.get('Private_Dirty', 0.0)
+    }
+
+
+class InferencePool:
+    def __init__(self, kind='tflite', model_path=None, workers=None, sr=16000, vad=None, logger=None):
+        """
+        Pool proses worker untuk decode, ekstraksi MFCC dan predict, agar
+        pekerjaan CPU tidak berebut GIL dengan front end Flask/Socket.IO.
+        Worker di-fork dari forkserver yang sudah memuat runtime (lihat
+        pool_context()), sehingga memori private per worker hanya state
+        model dan interpreter-nya. Modul utama tetap diimpor ulang oleh
+        multiprocessing di worker dan harus aman diimpor (app.py tanpa efek
+        samping saat import). Semua worker dijalankan saat start() sehingga
+        request pertama tidak menanggung biaya memuat model. Gate `vad` (VoiceActivityGate)
+        dijalankan di worker sebelum ekstraksi fitur.
+        """
+        self.kind = kind
+        self.model_path = model_path
+        self.workers = workers or os.cpu_count() or 1
+        self.sr = sr
+        self.pids = set()
+        self.logger = logger or logging.getLogger(__name__)
+        context = pool_context()
+        self._ready = context.Queue()
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(kind, model_path, sr, vad, self._ready)
+        )
+
+    def start(self, timeout=600):
+        # Setiap submit saat belum ada worker idle membuat satu proses baru;
+        # setiap worker melapor lewat antrian setelah model selesai dimuat
+        started = time.monotonic()
+        pings = [self._executor.submit(_ping) for _ in range(self.workers)]
+        pids = {self._ready.get(timeout=timeout) for _ in range(self.workers)}
+        for future in pings:
+            future.result(timeout=timeout)
+        self.pids = pids
+        self.logger.info(f"Inference pool ready: {len(pids)} workers in {time.monotonic() - started:.1f}s")
+        return pids
+
+    def classify_bytes(self, data, timeout=None):
+        """
+        Decode + VAD + fitur + predict di worker; mengembalikan (prediction,
+        fitur, durasi detik, durasi bagian bersuara). Selain durasi, semuanya
+        bernilai None jika gate VAD menilai clip tidak berisi suara.
+        """
+        return self._executor.submit(_classify_bytes, data).result(timeout=timeout)
+
+    def score_windows_bytes(self, data, timeout=None):
+        """
+        Penilaian per jendela untuk rekaman panjang di worker; mengembalikan
+        (prediksi per jendela, frame awal, durasi detik), prediksi None jika tanpa suara
+        """
+        return self._executor.submit(_score_windows, data).result(timeout=timeout)
+
+    def submit_bytes(self, data):
+        return self._executor.submit(_classify_bytes, data)
+
+    def predict(self, features, timeout=None):
+        return self._executor.submit(_predict, features).result(timeout=timeout)
+
+    def memory(self):
+        """
+        Memori per proses worker (pid -> rss/pss/private MB); halaman runtime
+        yang dipakai bersama dengan forkserver tidak dihitung sebagai private
+        """
+        report = {}
+        for pid in sorted(self.pids):
+            try:
+                report[pid] = process_memory_mb(pid)
+            except OSError:
+                continue
+        return report
+
+    def close(self):
+        # Request yang sudah dikirim ke worker tetap diselesaikan
+        self._executor.shutdown(wait=True)
+
+
+class PoolServingModel:
+    remote = True
+
+    def __init__(self, version, backend_name, model_path, workers=None, vad=None, logger=None):
+        """
+        Versi model yang dilayani oleh InferencePool; antarmukanya sama
+        dengan registry.ServingModel
+        """
+        self.version = version
+        self.backend = SimpleNamespace(name=backend_name, model_path=model_path)
+        self.scheduler = None
+        self.pool = InferencePool(backend_name, model_path, workers, vad=vad, logger=logger)
+        self.loaded_at = time.time()
+
+    def classify_bytes(self, data):
+        return self.pool.classify_bytes(data)
+
+    def predict(self, features):
+        return self.pool.predict(features)[0]
+
+    def predict_batch(self, batch):
+        return self.pool.predict(batch)
+
+    def score_windows_bytes(self, data):
+        return self.pool.score_windows_bytes(data)
+
+    def warm_up(self):
+        self.pool.start()
+
+    def memory(self):
+        return self.pool.memory()
+
+    def close(self):
+        self.pool.close()